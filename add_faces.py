@@ -1,112 +1,229 @@
-from tkinter import messagebox  # Import messagebox for confirmation
 import cv2
 import os
-import csv
+import queue
+import threading
 import mediapipe as mp
+from frame_sources import open_source
+from instrumentation import StageTimer
+from notifications import show_message
+from storage import DATABASE_FILE, AttendanceDatabase
+from liveness import landmarks_to_array
+from landmark_render import draw_landmarks
+from sample_quality import SampleGate, head_pose
+
+
+class AsyncImageWriter:
+    """Encode and write images on a background thread fed by a bounded queue."""
+
+    def __init__(self, queue_size=32):
+        self.queue = queue.Queue(maxsize=queue_size)  # Blocks the producer only if the disk falls far behind
+        self.errors = []
+        self.thread = threading.Thread(target=self.run, name="image-writer", daemon=True)
+        self.thread.start()
+
+    def write(self, path, image):
+        self.queue.put((path, image))
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            path, image = item
+            try:
+                if not cv2.imwrite(path, image):
+                    self.errors.append(f"{path}: could not be written")
+            except Exception as e:
+                self.errors.append(f"{path}: {e}")
+
+    def close(self):
+        """Wait for all queued images to be written and return the errors."""
+        self.queue.put(None)
+        self.thread.join()
+        return self.errors
 
 
 class FaceCapture:
-    def __init__(self, camera_index=0, user_id=None, user_name=None):
+    def __init__(self, camera_index=0, user_id=None, user_name=None, sample_count=30, mesh_interval=1,
+                 write_queue_size=32, headless=False, timer=None, database=DATABASE_FILE,
+                 notifier=None, progress=None, stop_event=None, landmark_mode="points", quality_gate=True,
+                 preview=None, max_rejected=300):
         self.user_id = user_id
         self.user_name = user_name
-        self.cap = cv2.VideoCapture(camera_index)
+        self.sample_count = sample_count
+        # Keep only sharp faces that differ from the samples already saved (see sample_quality),
+        # so sample_count varied images replace the 100 near-identical frames saved before
+        self.gate = SampleGate() if quality_gate else None
+        # Give up after this many rejected faces (about 10 s at 30 fps), e.g. when dim light
+        # makes every face blurry; None waits forever
+        self.max_rejected = max_rejected
+        # Run face mesh on every mesh_interval-th frame, the overlay reuses the last result in between
+        self.mesh_interval = max(1, int(mesh_interval))
+        self.write_queue_size = write_queue_size
+        # "points" draws every mesh landmark on the preview, "contours" only the outlines, "none" nothing
+        self.landmark_mode = landmark_mode
+        # Headless mode makes no GUI calls: no preview window, messages are printed
+        self.headless = headless
+        # notifier(kind, title, message) replaces messageboxes when capture runs on a worker thread,
+        # progress(count, sample_count) reports captured images and setting stop_event ends the capture
+        self.notifier = notifier
+        self.progress = progress
+        self.stop_event = stop_event
+        # preview(frame) receives the annotated frames instead of an OpenCV window; HighGUI must
+        # stay on the main thread, so capture on a worker thread hands frames to the GUI this way
+        self.preview = preview
+        # Per-stage latency statistics, disabled (and nearly free) unless a StageTimer is passed
+        self.timer = timer or StageTimer()
+        # camera_index may also be a video file, an image directory or a source object (see frame_sources)
+        self.cap = open_source(camera_index)
         if not self.cap.isOpened():
             raise Exception("Could not open video capture. Please check your camera.")
         self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
         if self.face_cascade.empty():
             raise Exception("Could not load haarcascades. Ensure the file exists.")
-        self.names_file = 'names.csv'
-        self.ensure_names_file()
+        # Users are stored in the attendance database (a path or an open AttendanceDatabase)
+        self.db = database if isinstance(database, AttendanceDatabase) else AttendanceDatabase(database)
+        # Set once capture_faces added the user, so a caller cleaning up a failed capture
+        # doesn't delete a user that existed before
+        self.user_added = False
 
         # Mediapipe face mesh
         self.mp_face_mesh = mp.solutions.face_mesh
         self.face_mesh = self.mp_face_mesh.FaceMesh()
 
-    def ensure_names_file(self):
-        """Ensure the names.csv file exists, if not, create it."""
-        if not os.path.exists(self.names_file):
-            with open(self.names_file, mode='w', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow(['ID', 'Name'])  # Write the header
+    def notify(self, kind, title, message):
+        """Show a messagebox, hand it to the notifier, or print it in headless mode."""
+        show_message(kind, title, message, self.notifier, self.headless)
 
     def capture_faces(self):
         try:
+            # Add the new ID and name to the users table
+            if not self.db.add_user(self.user_id, self.user_name):
+                raise Exception(f"ID {self.user_id} already exists.")
+            self.user_added = True
+
             face_dir = f"Faces/{self.user_id}_{self.user_name}"
             os.makedirs(face_dir, exist_ok=True)
 
-            # Add the new ID and name to names.csv
-            with open(self.names_file, mode='a', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow([self.user_id, self.user_name])
-
             count = 0
-            while True:
-                ret, frame = self.cap.read()
-                if not ret:
-                    messagebox.showwarning("Warning", "Failed to grab frame. Exiting...")
-                    break
-
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)  # Convert to grayscale for face detection
-                faces = self.face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(150, 150))
-
-                for (x, y, w, h) in faces:
-                    # Extract only the face region (without mesh for saving)
-                    face = frame[y:y + h, x:x + w]
-                    face = cv2.resize(face, (200, 200))  # Resize the face to a consistent size
-
-                    # Save the clean face image (without face mesh)
-                    count += 1
-                    try:
-                        cv2.imwrite(f"{face_dir}/{count}.jpg", face)
-                    except Exception as e:
-                        messagebox.showwarning("Warning", f"Error saving image {count}: {e}")
-
-                    # Draw the face mesh on the display frame (but not on the saved image)
-                    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    results = self.face_mesh.process(rgb_frame)
-                    if results.multi_face_landmarks:
-                        for face_landmarks in results.multi_face_landmarks:
-                            for landmark in face_landmarks.landmark:
-                                x_landmark = int(landmark.x * frame.shape[1])
-                                y_landmark = int(landmark.y * frame.shape[0])
-                                cv2.circle(frame, (x_landmark, y_landmark), 1, (0, 255, 0), -1)
+            gave_up = False  # Stopped by max_rejected
+            frame_index = 0
+            mesh_results = None
+            writer = AsyncImageWriter(self.write_queue_size)
+            try:
+                timer = self.timer
+                while not (self.stop_event and self.stop_event.is_set()):
+                    with timer.stage("read"):
+                        ret, frame = self.cap.read()
+                    if not ret:
+                        if getattr(self.cap, 'is_live', True):  # The end of a recording is not an error
+                            self.notify("showwarning", "Warning", "Failed to grab frame. Exiting...")
+                        break
+
+                    with timer.stage("cvtColor"):
+                        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)  # Convert to grayscale for face detection
+                    with timer.stage("detect"):
+                        faces = self.face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(150, 150))
+
+                    # Face mesh once per frame (or per interval) and only when a face is present
+                    pose = None
+                    if len(faces) and frame_index % self.mesh_interval == 0:
+                        with timer.stage("face_mesh"):
+                            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                            mesh_results = self.face_mesh.process(rgb_frame)
+                        # The mesh finds one face, so its pose only describes a single detection
+                        if len(faces) == 1 and mesh_results.multi_face_landmarks:
+                            pose = head_pose(landmarks_to_array(mesh_results.multi_face_landmarks[0]))
+                    elif not len(faces):
+                        mesh_results = None
+                    frame_index += 1
+
+                    for (x, y, w, h) in faces:
+                        # Extract only the face region (without mesh for saving)
+                        face = frame[y:y + h, x:x + w]
+                        face = cv2.resize(face, (200, 200))  # Resize the face to a consistent size
+
+                        if self.gate is not None:
+                            with timer.stage("quality"):
+                                keep = self.gate.accept(cv2.cvtColor(face, cv2.COLOR_BGR2GRAY), pose)
+                            if not keep:
+                                continue
+
+                        # Save the clean face image (without face mesh) on the writer thread
+                        count += 1
+                        with timer.stage("write"):
+                            writer.write(f"{face_dir}/{count}.jpg", face)
+                        if count >= self.sample_count:
+                            break
+
+                    # Draw the face mesh on the display frame (but not on the saved images)
+                    if mesh_results is not None and mesh_results.multi_face_landmarks:
+                        with timer.stage("draw"):
+                            frame_box = (0, 0, frame.shape[1], frame.shape[0])  # Landmarks are normalized to the frame
+                            for face_landmarks in mesh_results.multi_face_landmarks:
+                                draw_landmarks(frame, landmarks_to_array(face_landmarks), frame_box, (0, 255, 0),
+                                               self.landmark_mode)
 
                     # Display the capture count on the frame (not the saved face)
-                    cv2.putText(frame, f"Captured: {count}/100", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2)
-
-                    # Display the face region in a window for visualization
-                    cv2.imshow("Captured Face", frame)
-
-                if count >= 100:  # Capture 100 face images
-                    break
-
-                if cv2.waitKey(1) & 0xFF == ord('q'):
-                    break
+                    cv2.putText(frame, f"Captured: {count}/{self.sample_count}", (10, 30),
+                                cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2)
+                    timer.frame_done()
+                    if self.progress:
+                        self.progress(count, self.sample_count)
+                    if count >= self.sample_count:
+                        break
+                    if self.gate is not None and self.max_rejected is not None \
+                            and self.gate.rejected_count >= self.max_rejected:
+                        gave_up = True
+                        break
+
+                    if self.preview is not None:
+                        timer.draw_overlay(frame, origin=(10, 60))
+                        self.preview(frame)
+                    elif not self.headless:
+                        timer.draw_overlay(frame, origin=(10, 60))  # Below the capture count
+                        with timer.stage("imshow"):
+                            cv2.imshow("Captured Face", frame)
+                            key = cv2.waitKey(1)
+                        if key & 0xFF == ord('q'):
+                            break
+            finally:
+                errors = writer.close()  # Flush the remaining images to disk
+                self.timer.close()
+
+            if errors:
+                self.notify("showwarning", "Warning", f"Error saving {len(errors)} images, e.g. {errors[0]}")
+            if self.stop_event and self.stop_event.is_set():
+                self.notify("showinfo", "Capture Cancelled", f"Face capture cancelled after {count} images.")
+                return count
             # Show message after capture is complete
-            messagebox.showinfo("Capture Complete", "Face capture completed successfully!")
+            rejected = f", {self.gate.summary()}" if self.gate is not None else ""
+            hint = " Improve the lighting or hold still and try again." if gave_up else ""
+            if count == 0:
+                self.notify("showwarning", "Capture Failed", f"No face images were captured{rejected}.{hint}")
+                return count
+            if gave_up:
+                self.notify("showwarning", "Capture Stopped",
+                            f"Stopped with {count}/{self.sample_count} images{rejected}.{hint}")
+                return count
+            self.notify("showinfo", "Capture Complete",
+                        f"Face capture completed successfully! ({count} images{rejected})")
+            return count
 
         except Exception as e:
-            messagebox.showwarning("Warning", f"An error occurred: {e}")
+            self.notify("showwarning", "Warning", f"An error occurred: {e}")
 
         finally:
             self.cap.release()
-            cv2.destroyAllWindows()
+            if not self.headless and self.preview is None:
+                cv2.destroyAllWindows()
 
-    def delete_user_from_csv(self, user_id):
-        """Delete the user with the given ID from the names.csv file."""
+    def delete_user(self, user_id):
+        """Delete the user with the given ID from the users table."""
         try:
-            # rows = []
-            # Read all rows except the one with the given ID
-            with open(self.names_file, 'r') as file:
-                reader = csv.reader(file)
-                rows = [row for row in reader if row[0] != user_id]
-
-            # Write back the remaining rows to the file
-            with open(self.names_file, 'w', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerows(rows)
+            self.db.delete_user(user_id)
         except Exception as e:
-            messagebox.showwarning("Warning", f"Error deleting user from CSV: {e}")
+            self.notify("showwarning", "Warning", f"Error deleting user: {e}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,152 @@
+import os
+import numpy as np
+from storage import AttendanceDatabase
+
+CACHE_FILE = 'analytics_cache.npz'
+
+
+def seconds_of_day(text):
+    """'HH:MM:SS' -> seconds after midnight."""
+    hours, minutes, seconds = (int(part) for part in text.split(':'))
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def format_seconds(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def day_number(day):
+    """'YYYY-MM-DD' (or a date) -> days since 1970-01-01."""
+    return int(np.datetime64(day, 'D').astype(np.int64))
+
+
+def day_text(number):
+    return str(np.datetime64(int(number), 'D'))
+
+
+class AttendanceAnalytics:
+    """Columnar summary of every attendance row: user ID, day number and arrival second.
+
+    The columns are cached in analytics_cache.npz together with the highest attendance
+    rowid they include, so refresh() only reads rows added since the last call. The cache
+    also keeps a fingerprint of the rows it covers (their count and the last row), and is
+    rebuilt when the database no longer matches it, e.g. after rows were deleted or the
+    database was replaced. Reports are NumPy reductions over the columns and take
+    milliseconds for years of history. Rows whose day or time can't be parsed, e.g. from
+    hand-edited CSVs, are left out and counted in `skipped`.
+    """
+
+    def __init__(self, database=None, cache_file=CACHE_FILE):
+        self.db = database if isinstance(database, AttendanceDatabase) else AttendanceDatabase(database)
+        self.cache_file = cache_file
+        self.user_ids = np.empty(0, dtype=np.int32)
+        self.days = np.empty(0, dtype=np.int32)
+        self.seconds = np.empty(0, dtype=np.int32)
+        self.last_rowid = 0
+        self.fingerprint = ""
+        self.skipped = 0
+        self.load_cache()
+
+    def load_cache(self):
+        if not os.path.isfile(self.cache_file):
+            return
+        try:
+            with np.load(self.cache_file) as data:
+                self.user_ids, self.days, self.seconds = data["user_ids"], data["days"], data["seconds"]
+                self.last_rowid = int(data["last_rowid"])
+                self.fingerprint = str(data["fingerprint"])
+                self.skipped = int(data["skipped"])
+        except (OSError, ValueError, KeyError):
+            self.last_rowid = 0  # Unreadable cache, rebuilt by the next refresh
+
+    def save_cache(self):
+        tmp_file = self.cache_file + '.tmp.npz'
+        np.savez(tmp_file, user_ids=self.user_ids, days=self.days, seconds=self.seconds,
+                 last_rowid=np.int64(self.last_rowid), fingerprint=np.str_(self.fingerprint),
+                 skipped=np.int64(self.skipped))
+        os.replace(tmp_file, self.cache_file)
+
+    def rows_fingerprint(self, rowid):
+        """Count of the rows up to rowid and the content of that row."""
+        count = self.db.query("SELECT COUNT(*) FROM attendance WHERE rowid <= ?", (rowid,))[0][0]
+        row = self.db.query("SELECT user_id, day, time FROM attendance WHERE rowid = ?", (rowid,))
+        return f"{count}:{row[0] if row else None}"
+
+    def refresh(self):
+        """Append attendance rows added since the last refresh; returns how many were added."""
+        if self.last_rowid and self.rows_fingerprint(self.last_rowid) != self.fingerprint:
+            # Rows were deleted or the database was replaced, start over
+            self.user_ids, self.days, self.seconds = (np.empty(0, dtype=np.int32) for _ in range(3))
+            self.last_rowid = 0
+            self.skipped = 0
+        newest = self.db.query("SELECT IFNULL(MAX(rowid), 0) FROM attendance")[0][0]
+        if newest == self.last_rowid:
+            return 0
+
+        rows = self.db.query("SELECT rowid, user_id, day, time FROM attendance WHERE rowid > ? ORDER BY rowid",
+                             (self.last_rowid,))
+        day_numbers = {}
+        user_ids, days, seconds = [], [], []
+        for _, user_id, day, time in rows:
+            try:
+                if day not in day_numbers:
+                    day_numbers[day] = day_number(day)
+                arrival = seconds_of_day(time)
+            except (ValueError, TypeError, AttributeError):
+                self.skipped += 1
+                continue
+            user_ids.append(user_id)
+            days.append(day_numbers[day])
+            seconds.append(arrival)
+        self.user_ids = np.concatenate([self.user_ids, np.array(user_ids, dtype=np.int32)])
+        self.days = np.concatenate([self.days, np.array(days, dtype=np.int32)])
+        self.seconds = np.concatenate([self.seconds, np.array(seconds, dtype=np.int32)])
+        self.last_rowid = rows[-1][0]
+        self.fingerprint = self.rows_fingerprint(self.last_rowid)
+        self.save_cache()
+        return len(user_ids)
+
+    def period(self, start=None, end=None):
+        """Mask of rows between start and end days (inclusive, 'YYYY-MM-DD' or None)."""
+        mask = np.ones(len(self.days), dtype=bool)
+        if start:
+            mask &= self.days >= day_number(start)
+        if end:
+            mask &= self.days <= day_number(end)
+        return mask
+
+    def daily_headcount(self, start=None, end=None):
+        """[(day, people present)] for every day with attendance, oldest first."""
+        days, counts = np.unique(self.days[self.period(start, end)], return_counts=True)
+        return [(day_text(day), int(count)) for day, count in zip(days, counts)]
+
+    def user_summary(self, start=None, end=None, late_after="09:00:00"):
+        """Per user: (id, name, days present, attendance rate %, late arrivals, average arrival).
+
+        The rate is over the days on which anyone attended; late means arriving after late_after.
+        """
+        mask = self.period(start, end)
+        user_ids, days, seconds = self.user_ids[mask], self.days[mask], self.seconds[mask]
+        total_days = len(np.unique(days))
+        users = self.db.users()
+        if not users:
+            return []
+
+        # Dense index per known user; rows of deleted users are left out
+        ids = np.array([user_id for user_id, _ in users], dtype=np.int64)
+        order = np.argsort(ids)
+        position = np.searchsorted(ids[order], user_ids)
+        position = np.minimum(position, len(ids) - 1)
+        known = ids[order][position] == user_ids
+        index = order[position[known]]
+        present = np.bincount(index, minlength=len(ids))
+        late = np.bincount(index, weights=seconds[known] > seconds_of_day(late_after), minlength=len(ids))
+        arrival = np.bincount(index, weights=seconds[known], minlength=len(ids))
+
+        summary = []
+        for i, (user_id, name) in enumerate(users):
+            rate = 100.0 * present[i] / total_days if total_days else 0.0
+            average = format_seconds(arrival[i] / present[i]) if present[i] else ""
+            summary.append((user_id, name, int(present[i]), round(float(rate), 1), int(late[i]), average))
+        return summary
@@ -0,0 +1,57 @@
+import datetime
+import threading
+from storage import DATABASE_FILE, AttendanceDatabase
+
+
+class AttendanceStore:
+    """Today's attendance kept in memory, keyed by user ID.
+
+    Today's marked IDs are read from the attendance database once into a set and new
+    marks are inserted as they happen. When the date changes the store rolls over to
+    the new day.
+    """
+
+    def __init__(self, database=None, clock=datetime.datetime.now):
+        # database is an AttendanceDatabase, or a path to open one that is closed with the store
+        if isinstance(database, AttendanceDatabase):
+            self.db, self.owns_database = database, False
+        else:
+            self.db, self.owns_database = AttendanceDatabase(database or DATABASE_FILE), True
+        self.clock = clock
+        self.lock = threading.Lock()  # Recognition may mark from a worker thread
+        self.day = None
+        self.marked_ids = set()
+
+    @staticmethod
+    def key(user_id):
+        """Normalize an ID so 7, "7" and " 7" are the same key."""
+        return str(user_id).strip()
+
+    def roll_over(self):
+        """Switch to today if the date changed since the last call."""
+        today = self.clock().strftime('%Y-%m-%d')
+        if today == self.day:
+            return
+        self.day = today
+        self.marked_ids = {self.key(user_id) for user_id in self.db.marked_ids(today)}
+
+    def is_marked(self, user_id):
+        """Check if attendance has already been marked for the user today."""
+        with self.lock:
+            self.roll_over()
+            return self.key(user_id) in self.marked_ids
+
+    def mark(self, user_id, name):
+        """Record attendance unless the user is already marked; returns True if recorded."""
+        with self.lock:
+            self.roll_over()
+            key = self.key(user_id)
+            if key in self.marked_ids:
+                return False
+            self.marked_ids.add(key)
+            # The database also refuses a second mark, e.g. one made by another process
+            return self.db.mark(key, name, self.day, self.clock().strftime('%H:%M:%S'))
+
+    def close(self):
+        if self.owns_database:
+            self.db.close()
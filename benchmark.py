@@ -0,0 +1,241 @@
+import os
+import csv
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import datetime
+import contextlib
+import numpy as np
+import cv2
+from lbp_engine import ENGINES
+
+
+def generate_faces(root, users, images_per_user, seed=0):
+    """Write Faces/<id>_<name>/ trees and names.csv; each user is a fixed blurred pattern plus noise."""
+    rng = np.random.default_rng(seed)
+    faces_dir = os.path.join(root, "Faces")
+    with open(os.path.join(root, "names.csv"), mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['ID', 'Name'])
+        for user_id in range(1, users + 1):
+            name = f"User{user_id}"
+            writer.writerow([user_id, name])
+            user_dir = os.path.join(faces_dir, f"{user_id}_{name}")
+            os.makedirs(user_dir, exist_ok=True)
+            base = cv2.GaussianBlur(rng.integers(0, 256, (200, 200), dtype=np.uint8), (9, 9), 0)
+            for count in range(1, images_per_user + 1):
+                cv2.imwrite(os.path.join(user_dir, f"{count}.jpg"), synthetic_sample(base, rng))
+
+
+def synthetic_sample(base, rng):
+    """A new noisy capture of a user's base pattern."""
+    return cv2.add(base, rng.integers(0, 12, base.shape, dtype=np.uint8))
+
+
+def generate_attendance(root, users, days, present=0.8, seed=0):
+    """Write attendance/<date>.csv for the last `days` days with a `present` share of users each day."""
+    rng = np.random.default_rng(seed)
+    attendance_dir = os.path.join(root, "attendance")
+    os.makedirs(attendance_dir, exist_ok=True)
+    today = datetime.date.today()
+    for offset in range(days):
+        day = today - datetime.timedelta(days=offset + 1)  # Today's file is left to the store
+        with open(os.path.join(attendance_dir, f"{day:%Y-%m-%d}.csv"), mode='w', newline='') as file:
+            writer = csv.writer(file)
+            for user_id in np.flatnonzero(rng.random(users) < present) + 1:
+                seconds = int(rng.normal(9 * 3600, 1800))
+                writer.writerow([user_id, f"User{user_id}", f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"])
+
+
+@contextlib.contextmanager
+def working_directory(path):
+    """The application uses paths relative to the working directory."""
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    function(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def percentiles(samples):
+    samples = np.asarray(samples) * 1000.0
+    return {"p50_ms": float(np.percentile(samples, 50)), "p95_ms": float(np.percentile(samples, 95)),
+            "mean_ms": float(samples.mean())}
+
+
+def bench_training(engine):
+    """Full training from an empty cache, then again with the dataset cache warm."""
+    import train_model
+    shutil.rmtree("dataset_cache", ignore_errors=True)
+    cold = timed(train_model.Trainer(engine=engine, headless=True).train_faces)
+    warm = timed(train_model.Trainer(engine=engine, headless=True).train_faces)
+    return {"cold_s": cold, "warm_cache_s": warm}
+
+
+def bench_predict(engine, users, samples=50, seed=1):
+    """Latency of recognizing one held-out face, and of a batch when the engine supports it."""
+    from lbp_engine import MODEL_FILES, create_recognizer, current_model_file
+    recognizer = create_recognizer(engine)
+    start = time.perf_counter()
+    recognizer.read(current_model_file(MODEL_FILES[engine]))
+    load_time = time.perf_counter() - start
+
+    rng = np.random.default_rng(seed)
+    user_ids = rng.choice(np.arange(1, users + 1), size=min(samples, users), replace=False)
+    faces = []
+    for user_id in user_ids:
+        # Re-read a training image and add fresh noise, close to a new capture of the same person
+        image = cv2.imread(os.path.join("Faces", f"{user_id}_User{user_id}", "1.jpg"), cv2.IMREAD_GRAYSCALE)
+        faces.append(synthetic_sample(image, rng))
+
+    latencies = []
+    correct = 0
+    for user_id, face in zip(user_ids, faces):
+        start = time.perf_counter()
+        label, _ = recognizer.predict(face)
+        latencies.append(time.perf_counter() - start)
+        correct += int(label == user_id)
+
+    result = {"model_load_s": load_time, "predict": percentiles(latencies), "top1_accuracy": correct / len(faces)}
+    if hasattr(recognizer, "predict_batch"):
+        batch = faces[:4]  # A busy frame
+        result["batch4_ms"] = 1000.0 * timed(recognizer.predict_batch, batch, 3)
+    return result
+
+
+def bench_detection(frames=60, seed=2):
+    """Frames per second of the full-resolution cascade versus the detection scheduler."""
+    from face_tracker import DetectionScheduler
+    rng = np.random.default_rng(seed)
+    cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    background = cv2.GaussianBlur(rng.integers(0, 256, (480, 640), dtype=np.uint8), (5, 5), 0)
+    grays = [np.roll(background, shift, axis=1) for shift in range(0, 4 * frames, 4)]
+
+    full = timed(lambda: [cascade.detectMultiScale(gray, 1.3, 5) for gray in grays])
+    scheduler = DetectionScheduler(cascade)
+    scheduled = timed(lambda: [scheduler.update(gray) for gray in grays])
+    return {"full_resolution_fps": frames / full, "scheduled_fps": frames / scheduled, "report": scheduler.report(scheduled)}
+
+
+def bench_attendance(users, lookups=1000, seed=3):
+    """Cost of the old per-call CSV scan versus the database-backed attendance store."""
+    from storage import AttendanceDatabase
+    from attendance_store import AttendanceStore
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+    db = AttendanceDatabase()  # First open imports names.csv and the generated day files
+    import_time = time.perf_counter() - start
+    store = AttendanceStore(db)
+    load = timed(store.roll_over)
+    half = users // 2
+    mark = timed(lambda: [store.mark(user_id, f"User{user_id}") for user_id in range(1, half + 1)])
+    ids = rng.integers(1, users + 1, size=lookups)
+    lookup = timed(lambda: [store.is_marked(user_id) for user_id in ids])
+    days = db.attendance_days()
+    day_query = timed(lambda: [db.attendance_for_day(day) for day in days])
+    user_query = timed(lambda: [db.attendance_for_user(user_id) for user_id in ids[:100]])
+    store.close()
+    db.close()
+
+    # What attendance_already_marked did before the store: read a day file on every call
+    path = max((os.path.join("attendance", name) for name in os.listdir("attendance")), key=os.path.getsize)
+
+    def scan(name):
+        with open(path, mode='r') as file:
+            return any(row[1] == name for row in csv.reader(file))
+
+    scans = min(lookups, 200)
+    scan_time = timed(lambda: [scan(f"User{user_id}") for user_id in ids[:scans]])
+    return {"csv_import_s": import_time, "store_load_s": load, "mark_us": 1e6 * mark / max(1, half),
+            "lookup_us": 1e6 * lookup / lookups, "csv_scan_us": 1e6 * scan_time / scans,
+            "day_query_ms": 1000.0 * day_query / max(1, len(days)), "user_history_ms": 1000.0 * user_query / 100}
+
+
+def bench_treeview():
+    """Time until the user list and the largest day show their first batch of Treeview rows."""
+    try:
+        import tkinter as tk
+        import main
+        root = tk.Tk()
+    except Exception as e:  # No display, or GUI dependencies missing
+        return {"skipped": str(e)}
+    try:
+        root.withdraw()
+        app = main.SmartAttendanceSystem(root)
+        largest = max(app.db.attendance_days(), key=lambda day: len(app.db.attendance_for_day(day)))
+        app.attendance_combobox.set(largest)
+        result = {"names_s": timed(app.show_all_data), "day_s": timed(app.load_attendance_data, None)}
+        root.update()
+        app.db.close()
+        return result
+    finally:
+        root.destroy()
+
+
+def run(sizes, images_per_user, days, engines, stages):
+    results = []
+    for users in sizes:
+        work_dir = tempfile.mkdtemp(prefix=f"attendance_bench_{users}_")
+        try:
+            with working_directory(work_dir):
+                entry = {"users": users, "images_per_user": images_per_user, "days": days}
+                entry["generate_s"] = timed(generate_faces, work_dir, users, images_per_user)
+                entry["generate_s"] += timed(generate_attendance, work_dir, users, days)
+                for engine in engines:
+                    if "train" in stages:
+                        entry[f"train_{engine}"] = bench_training(engine)
+                    if "predict" in stages:
+                        entry[f"predict_{engine}"] = bench_predict(engine, users)
+                if "detect" in stages:
+                    entry["detection"] = bench_detection()
+                if "attendance" in stages:
+                    entry["attendance"] = bench_attendance(users)
+                if "treeview" in stages:
+                    entry["treeview"] = bench_treeview()
+                results.append(entry)
+                print(json.dumps(entry, indent=2))
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+STAGES = ("train", "predict", "detect", "attendance", "treeview")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark training, recognition and attendance I/O on synthetic data")
+    parser.add_argument("--users", type=int, nargs="+", default=[10, 1000], help="roster sizes to generate")
+    parser.add_argument("--images-per-user", type=int, default=10, help="face images per generated user")
+    parser.add_argument("--days", type=int, default=30, help="days of attendance history to generate")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(ENGINES), help="recognizer engines")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES), help="benchmarks to run")
+    parser.add_argument("--output", default="bench_results.json", help="machine readable results file")
+    args = parser.parse_args(argv)
+
+    report = {
+        "timestamp": datetime.datetime.now().isoformat(timespec='seconds'),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "cpu_count": os.cpu_count(),
+        "results": run(args.users, args.images_per_user, args.days, args.engines, args.stages),
+    }
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
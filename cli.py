@@ -0,0 +1,231 @@
+import argparse
+from lbp_engine import ENGINES, MODEL_FILES
+from instrumentation import StageTimer
+from landmark_render import LANDMARK_MODES
+from recognition_client import HOST, PORT
+
+
+def make_timer(args):
+    """Stage timer from the --profile options, disabled unless asked for."""
+    return StageTimer(enabled=args.profile or args.overlay or bool(args.profile_output), overlay=args.overlay,
+                      snapshot_path=args.profile_output)
+
+
+def enroll(args):
+    """Capture face samples for a new user, then add them to the model."""
+    import add_faces
+    fc = add_faces.FaceCapture(camera_index=args.source, user_id=args.id, user_name=args.name,
+                               sample_count=args.samples, headless=args.headless, timer=make_timer(args),
+                               landmark_mode=args.landmarks, quality_gate=not args.keep_all,
+                               max_rejected=args.max_rejected or None)
+    fc.capture_faces()
+    print_profile(fc.timer)
+    if not args.no_train:
+        import train_model
+        train_model.Trainer(engine=args.engine, headless=True).train_faces(incremental=True)
+
+
+def train(args):
+    """Train the model on Faces/."""
+    import train_model
+    trainer = train_model.Trainer(engine=args.engine, headless=True, prototypes=args.prototypes)
+    trainer.train_faces(incremental=not args.full)
+
+
+def recognize(args):
+    """Recognize faces and mark attendance."""
+    import recognize_faces
+    if not 1 <= args.min_votes <= args.identity_window:
+        raise SystemExit(f"--min-votes must be between 1 and --identity-window ({args.identity_window}).")
+    service = None
+    if args.service:
+        from recognition_client import RecognitionClient
+        service = RecognitionClient(args.host, args.port)
+    recognizer = recognize_faces.FaceRecognizer(camera_index=args.source, detect_interval=args.detect_interval,
+                                                detect_scale=args.detect_scale, engine=args.engine,
+                                                threshold=args.threshold, headless=args.headless,
+                                                timer=make_timer(args), landmark_mode=args.landmarks,
+                                                service=service, identity_window=args.identity_window,
+                                                min_votes=args.min_votes, reverify_interval=args.reverify_interval)
+    recognizer.recognize_faces(threaded=not args.serial)
+    print_profile(recognizer.timer)
+
+
+def multi(args):
+    """Recognize on several cameras or streams, one process each, into one attendance database."""
+    import multi_camera
+    multi_camera.run(args.sources, engine=args.engine, detect_interval=args.detect_interval,
+                     detect_scale=args.detect_scale, threshold=args.threshold)
+
+
+def serve(args):
+    """Keep the model loaded and recognize faces for kiosks connecting over a local socket."""
+    import recognition_service
+    recognition_service.RecognitionService(engine=args.engine, host=args.host, port=args.port,
+                                           max_batch=args.max_batch, max_wait_ms=args.max_wait_ms, threshold=args.threshold,
+                                           detect_interval=args.detect_interval,
+                                           detect_scale=args.detect_scale).run()
+
+
+def status(args):
+    """Print the health and throughput metrics of a running recognition service."""
+    from recognition_client import RecognitionClient
+    client = RecognitionClient(args.host, args.port)
+    try:
+        health = client.health()
+    finally:
+        client.close()
+    stages = health.pop("stages")
+    for key, value in health.items():
+        print(f"{key:>16}: {value:.2f}" if isinstance(value, float) else f"{key:>16}: {value}")
+    for name, stats in stages.items():
+        print(f"{name:>16}: p50 {stats['p50_ms']:.2f} ms, p95 {stats['p95_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms")
+
+
+def convert(args):
+    """Convert the OpenCV trainer.yml to the memory-mapped model of the numpy engine."""
+    import lbp_engine
+    recognizer = lbp_engine.convert_opencv_model(args.input, args.output)
+    print(f"Converted {len(recognizer.labels)} histograms of {len(recognizer.unique_labels)} users to {args.output}")
+
+
+def compact(args):
+    """Reduce every user to k representative histograms, or report accuracy versus speed per k."""
+    import model_compaction
+    import lbp_engine
+    if args.evaluate:
+        import train_model
+        trainer = train_model.Trainer(headless=True)
+        faces, ids = trainer.load_images(trainer.scan_faces())
+        print(f"{'k':>6} {'histograms':>10} {'accuracy':>9} {'predict ms':>10}")
+        for result in model_compaction.evaluate(faces, ids, args.k, holdout=args.holdout):
+            k = "all" if result["k"] is None else result["k"]
+            print(f"{k:>6} {result['histograms']:>10} {result['top1_accuracy']:>9.3f} {result['predict_ms']:>10.2f}")
+        return
+
+    if args.engine != "numpy":
+        # The result is always a numpy engine model, which recognizers on the opencv engine never read
+        raise SystemExit("Compaction produces a numpy engine model. Run 'python cli.py convert' first, "
+                         "then compact with --engine numpy and recognize with --engine numpy.")
+    recognizer = lbp_engine.load_model(args.engine)
+    compacted = model_compaction.compact(recognizer, args.k[0])
+    version = lbp_engine.publish_model(compacted, args.output)
+    if args.output == MODEL_FILES[args.engine]:
+        # Later incremental training compacts new users the same way
+        import train_model
+        train_model.Trainer(engine=args.engine, headless=True).record_prototypes(args.k[0])
+    print(f"Kept {len(compacted.labels)} of {len(recognizer.getLabels())} histograms, "
+          f"saved as {lbp_engine.current_model_file(args.output)} (version {version})")
+
+
+def print_profile(timer):
+    if not timer.enabled:
+        return
+    for name, stats in timer.summary().items():
+        print(f"{name:>10}: p50 {stats['p50_ms']:.2f} ms, p95 {stats['p95_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Smart Attendance System command line")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_source_options(subparser):
+        subparser.add_argument("--source", default="0",
+                               help="camera index, video file or image directory (default: camera 0)")
+        subparser.add_argument("--headless", action="store_true", help="no windows or message boxes")
+        subparser.add_argument("--profile", action="store_true", help="time each stage and print p50/p95/p99")
+        subparser.add_argument("--overlay", action="store_true", help="draw FPS and stage latencies on the preview")
+        subparser.add_argument("--profile-output", help="append periodic stage snapshots to this .json or .csv file")
+        subparser.add_argument("--landmarks", choices=LANDMARK_MODES, default="points",
+                               help="face mesh overlay: every point, contours only, or none")
+
+    def add_engine_option(subparser):
+        subparser.add_argument("--engine", choices=ENGINES, default="opencv", help="recognizer engine")
+
+    enroll_parser = subparsers.add_parser("enroll", help=enroll.__doc__)
+    add_source_options(enroll_parser)
+    add_engine_option(enroll_parser)
+    enroll_parser.add_argument("--id", required=True, help="user ID (digits)")
+    enroll_parser.add_argument("--name", required=True, help="user name (letters)")
+    enroll_parser.add_argument("--samples", type=int, default=30, help="number of face samples to save")
+    enroll_parser.add_argument("--keep-all", action="store_true",
+                               help="save every detected face, without the sharpness and duplicate checks")
+    enroll_parser.add_argument("--max-rejected", type=int, default=300,
+                               help="stop after this many blurry or duplicate faces (0: never)")
+    enroll_parser.add_argument("--no-train", action="store_true", help="skip updating the model")
+    enroll_parser.set_defaults(func=enroll)
+
+    train_parser = subparsers.add_parser("train", help=train.__doc__)
+    add_engine_option(train_parser)
+    train_parser.add_argument("--full", action="store_true", help="retrain from scratch instead of incrementally")
+    train_parser.add_argument("--prototypes", type=int,
+                              help="keep at most this many histograms per user (numpy engine)")
+    train_parser.set_defaults(func=train)
+
+    def add_service_options(subparser):
+        subparser.add_argument("--host", default=HOST, help="recognition service address")
+        subparser.add_argument("--port", type=int, default=PORT, help="recognition service port")
+
+    def add_recognition_options(subparser):
+        add_engine_option(subparser)
+        subparser.add_argument("--detect-interval", type=int, default=5, help="run the cascade every N frames")
+        subparser.add_argument("--detect-scale", type=float, default=0.5, help="downscale factor for detection")
+        subparser.add_argument("--threshold", type=float, default=50, help="maximum LBPH distance to accept")
+
+    recognize_parser = subparsers.add_parser("recognize", help=recognize.__doc__)
+    add_source_options(recognize_parser)
+    add_recognition_options(recognize_parser)
+    recognize_parser.add_argument("--serial", action="store_true", help="process frames on a single thread")
+    recognize_parser.add_argument("--service", action="store_true",
+                                  help="predict and check liveness in a running recognition service")
+    add_service_options(recognize_parser)
+    recognize_parser.add_argument("--reverify-interval", type=int, default=15,
+                                  help="predict a recognized face again every N frames")
+    recognize_parser.add_argument("--identity-window", type=int, default=5,
+                                  help="number of recent predictions a face's name is voted on")
+    recognize_parser.add_argument("--min-votes", type=int, default=3,
+                                  help="agreeing predictions within --identity-window needed to name a face")
+    recognize_parser.set_defaults(func=recognize)
+
+    multi_parser = subparsers.add_parser("multi", help=multi.__doc__)
+    multi_parser.add_argument("sources", nargs="+", help="camera indexes, video files or image directories")
+    add_recognition_options(multi_parser)
+    multi_parser.set_defaults(func=multi)
+
+    serve_parser = subparsers.add_parser("serve", help=serve.__doc__)
+    add_recognition_options(serve_parser)
+    add_service_options(serve_parser)
+    serve_parser.add_argument("--max-batch", type=int, default=64, help="most faces scored in one predict call")
+    serve_parser.add_argument("--max-wait-ms", type=float, default=5.0,
+                              help="how long a batch waits for requests from other clients")
+    serve_parser.set_defaults(func=serve)
+
+    status_parser = subparsers.add_parser("status", help=status.__doc__)
+    add_service_options(status_parser)
+    status_parser.set_defaults(func=status)
+
+    convert_parser = subparsers.add_parser("convert", help=convert.__doc__)
+    convert_parser.add_argument("--input", default=MODEL_FILES["opencv"], help="OpenCV LBPH model file")
+    convert_parser.add_argument("--output", default=MODEL_FILES["numpy"], help="binary model file to write")
+    convert_parser.set_defaults(func=convert)
+
+    compact_parser = subparsers.add_parser("compact", help=compact.__doc__)
+    add_engine_option(compact_parser)
+    compact_parser.add_argument("--k", type=int, nargs="+", default=[5],
+                                help="histograms kept per user (several values with --evaluate)")
+    compact_parser.add_argument("--evaluate", action="store_true",
+                                help="compare accuracy and predict time on held-out images from Faces/")
+    compact_parser.add_argument("--holdout", type=float, default=0.2, help="share of each user's images held out")
+    compact_parser.add_argument("--output", default=MODEL_FILES["numpy"], help="compacted model file to write")
+    compact_parser.set_defaults(func=compact, engine="numpy")  # Compaction only works on numpy models
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
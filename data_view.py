@@ -0,0 +1,114 @@
+class TableModel:
+    """Rows shown in the data view, kept in memory with the current sort and filter applied.
+
+    Sorting and filtering work on the loaded rows, so neither goes back to the database.
+    """
+
+    def __init__(self):
+        self.rows = []
+        self.view = []
+        self.filter_text = ""
+        self.sort_column = None
+        self.sort_descending = False
+
+    def set_rows(self, rows):
+        self.rows = [tuple(row) for row in rows]
+        self.apply()
+
+    def add_rows(self, rows):
+        """Add rows; returns the ones that became visible at the end of the view, or None if the
+        view had to be rebuilt because it is sorted."""
+        rows = [tuple(row) for row in rows]
+        self.rows.extend(rows)
+        if self.sort_column is not None:
+            self.apply()
+            return None
+        visible = [row for row in rows if self.matches(row)]
+        self.view.extend(visible)
+        return visible
+
+    def matches(self, row):
+        return not self.filter_text or any(self.filter_text in str(value).lower() for value in row)
+
+    def set_filter(self, text):
+        self.filter_text = text.strip().lower()
+        self.apply()
+
+    def sort_by(self, column):
+        """Sort by a column index; sorting by the same column again reverses the order."""
+        if column == self.sort_column:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_column, self.sort_descending = column, False
+        self.apply()
+
+    @staticmethod
+    def sort_key(value):
+        # Numbers before text, numbers compared as numbers so ID 10 comes after ID 9
+        if isinstance(value, (int, float)):
+            return (0, value, "")
+        return (1, 0, str(value).lower())
+
+    def apply(self):
+        """Rebuild the visible rows from all rows."""
+        view = self.rows
+        if self.filter_text:
+            view = [row for row in view if self.matches(row)]
+        if self.sort_column is not None:
+            column = self.sort_column
+            view = sorted(view, key=lambda row: self.sort_key(row[column]) if column < len(row) else (2, 0, ""),
+                          reverse=self.sort_descending)
+        self.view = list(view)
+
+
+class ChunkedTreeviewLoader:
+    """Fills a Treeview in batches scheduled with root.after so the window stays responsive.
+
+    Starting a new load cancels the one still in progress.
+    """
+
+    def __init__(self, root, treeview, chunk_size=500, on_done=None):
+        self.root = root
+        self.treeview = treeview
+        self.chunk_size = chunk_size
+        self.on_done = on_done
+        self.rows = []
+        self.position = 0
+        self.pending = None
+
+    def clear(self):
+        """Cancel any load in progress and delete every item in one call."""
+        self.cancel()
+        self.treeview.delete(*self.treeview.get_children())
+
+    def cancel(self):
+        if self.pending is not None:
+            self.root.after_cancel(self.pending)
+            self.pending = None
+
+    def load(self, rows):
+        self.clear()
+        self.rows = list(rows)
+        self.position = 0
+        self.insert_chunk()
+
+    def append(self, rows):
+        """Add rows after the ones already loaded or queued, without reloading the view."""
+        self.rows = self.rows + list(rows)
+        if not self.loading:
+            self.insert_chunk()
+
+    def insert_chunk(self):
+        self.pending = None
+        end = min(self.position + self.chunk_size, len(self.rows))
+        for row in self.rows[self.position:end]:
+            self.treeview.insert("", "end", values=row)
+        self.position = end
+        if end < len(self.rows):
+            self.pending = self.root.after(1, self.insert_chunk)  # Let Tk handle events between chunks
+        elif self.on_done:
+            self.on_done()
+
+    @property
+    def loading(self):
+        return self.pending is not None
@@ -0,0 +1,195 @@
+import os
+import csv
+import shutil
+import itertools
+import functools
+import subprocess
+from PIL import Image, ImageDraw, ImageFont
+
+ROWS_PER_PAGE = 45
+
+# PDF pages are A4 in points, PNG pages A4 at 100 dpi
+PDF_PAGE_SIZE = (595, 842)
+PNG_PAGE_SIZE = (827, 1169)
+MARGIN = 40
+
+
+def pages(records, rows_per_page=ROWS_PER_PAGE):
+    """Yield records in lists of rows_per_page; only one page is held at a time."""
+    records = iter(records)
+    while True:
+        page = list(itertools.islice(records, rows_per_page))
+        if not page:
+            return
+        yield page
+
+
+def column_positions(headers, width):
+    """x of each column, splitting the printable width evenly."""
+    step = (width - 2 * MARGIN) / max(1, len(headers))
+    return [MARGIN + i * step for i in range(len(headers))]
+
+
+@functools.lru_cache(maxsize=None)
+def load_font(size):
+    """The report font, loaded once per size."""
+    for name in ("arial.ttf", "DejaVuSans.ttf"):
+        try:
+            return ImageFont.truetype(name, size)
+        except IOError:
+            pass
+    return ImageFont.load_default()
+
+
+def export_csv(records, path, headers, title=None):
+    with open(path, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(headers)
+        writer.writerows(records)
+    return [path]
+
+
+class PdfTextWriter:
+    """Minimal PDF writer: text-only pages in the built-in Helvetica, written as they are added.
+
+    Object 1 is the catalog, 2 the page tree and 3 the font; each page adds a page and a
+    content object. The page tree is written last, once all pages are known.
+    """
+
+    def __init__(self, file, page_size=PDF_PAGE_SIZE):
+        self.file = file
+        self.page_size = page_size
+        self.offsets = {}
+        self.page_ids = []
+        self.next_id = 4
+        file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def write_object(self, object_id, body):
+        self.offsets[object_id] = self.file.tell()
+        self.file.write(f"{object_id} 0 obj\n".encode() + body + b"\nendobj\n")
+
+    @staticmethod
+    def escape(text):
+        text = str(text).replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+        return text.encode('latin-1', errors='replace')
+
+    def add_page(self, lines):
+        """lines: (x, y, text, size) with y measured from the top of the page."""
+        height = self.page_size[1]
+        content = b"".join(b"BT /F1 %d Tf %.1f %.1f Td (" % (size, x, height - y) + self.escape(text) + b") Tj ET\n"
+                           for x, y, text, size in lines)
+        page_id, content_id = self.next_id, self.next_id + 1
+        self.next_id += 2
+        self.write_object(content_id, b"<< /Length %d >>\nstream\n" % len(content) + content + b"endstream")
+        self.write_object(page_id, b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+                                   b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+                          % (self.page_size[0], height, content_id))
+        self.page_ids.append(page_id)
+
+    def close(self):
+        kids = b" ".join(b"%d 0 R" % page_id for page_id in self.page_ids)
+        self.write_object(2, b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(self.page_ids))
+        self.write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        self.write_object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+        xref = self.file.tell()
+        self.file.write(b"xref\n0 %d\n0000000000 65535 f \n" % self.next_id)
+        for object_id in range(1, self.next_id):
+            self.file.write(b"%010d 00000 n \n" % self.offsets[object_id])
+        self.file.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (self.next_id, xref))
+
+
+def page_lines(page, headers, title, number, width, line_height, size):
+    """Text lines of one page: title, page number, column headers and the rows."""
+    x = column_positions(headers, width)
+    lines = [(MARGIN, MARGIN, title or "", size + 4), (width - MARGIN - 60, MARGIN, f"Page {number}", size)]
+    y = MARGIN + 2 * line_height
+    lines.extend((x[i], y, header, size) for i, header in enumerate(headers))
+    for record in page:
+        y += line_height
+        lines.extend((x[i], y, value, size) for i, value in enumerate(record[:len(headers)]))
+    return lines
+
+
+def export_pdf(records, path, headers, title=None, rows_per_page=ROWS_PER_PAGE):
+    """Write records as a multi-page PDF, one page in memory at a time."""
+    with open(path, 'wb') as file:
+        writer = PdfTextWriter(file)
+        for number, page in enumerate(pages(records, rows_per_page), start=1):
+            writer.add_page(page_lines(page, headers, title, number, PDF_PAGE_SIZE[0], 16, 10))
+        if not writer.page_ids:
+            writer.add_page(page_lines([], headers, title, 1, PDF_PAGE_SIZE[0], 16, 10))
+        writer.close()
+    return [path]
+
+
+def export_png(records, path, headers, title=None, rows_per_page=ROWS_PER_PAGE):
+    """Write records as report_001.png, report_002.png, ... for path report.png; returns the files."""
+    base, ext = os.path.splitext(path)
+    paths = []
+    for number, page in enumerate(pages(records, rows_per_page), start=1):
+        image = Image.new("RGB", PNG_PAGE_SIZE, "white")
+        draw = ImageDraw.Draw(image)
+        for x, y, text, size in page_lines(page, headers, title, number, PNG_PAGE_SIZE[0], 22, 16):
+            draw.text((x, y), str(text), fill="black", font=load_font(size))
+        page_path = f"{base}_{number:03d}{ext}"
+        image.save(page_path)
+        paths.append(page_path)
+    return paths
+
+
+EXPORTERS = {".csv": export_csv, ".pdf": export_pdf, ".png": export_png}
+
+
+def export(records, path, headers, title=None):
+    """Export records by the file extension of path (.pdf, .png or .csv); returns the files written."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in EXPORTERS:
+        raise ValueError(f"Unsupported export format: {ext or path}")
+    return EXPORTERS[ext](records, path, headers, title=title)
+
+
+class LprPrinter:
+    """Print through lpr, or any command taking the same -P printer and file arguments."""
+
+    def __init__(self, command="lpr", printer=None):
+        self.command = command
+        self.printer = printer
+
+    def print_file(self, path):
+        args = [self.command]
+        if self.printer:
+            args += ["-P", self.printer]
+        subprocess.run(args + [path], check=True)
+        return f"Sent {os.path.basename(path)} to {self.printer or 'the default printer'}"
+
+
+class WindowsShellPrinter:
+    """Print with the application registered for the file type, as Explorer's Print does."""
+
+    def print_file(self, path):
+        os.startfile(path, "print")
+        return f"Sent {os.path.basename(path)} to the default printer"
+
+
+class SpoolDirectoryPrinter:
+    """Stand-in printer that copies files into a spool directory, e.g. one watched by a print service."""
+
+    def __init__(self, directory="print_spool"):
+        self.directory = directory
+
+    def print_file(self, path):
+        os.makedirs(self.directory, exist_ok=True)
+        destination = shutil.copy(path, self.directory)
+        return f"Spooled {os.path.basename(path)} to {destination}"
+
+
+def default_printer():
+    """ATTENDANCE_PRINT_SPOOL selects a spool directory; otherwise lpr, the Windows shell, or ./print_spool."""
+    spool = os.environ.get("ATTENDANCE_PRINT_SPOOL")
+    if spool:
+        return SpoolDirectoryPrinter(spool)
+    if shutil.which("lpr"):
+        return LprPrinter(printer=os.environ.get("ATTENDANCE_PRINTER"))
+    if os.name == "nt":
+        return WindowsShellPrinter()
+    return SpoolDirectoryPrinter()
@@ -0,0 +1,138 @@
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+
+
+class FaceDataset:
+    """Packed grayscale cache of the Faces/ directory used by the Trainer.
+
+    All faces live in one contiguous uint8 array (faces.npy, N x 200 x 200) with a
+    matching id vector (ids.npy). index.json records, per user directory, where its
+    rows start and a signature built from the directory and image mtimes, so only
+    directories that changed are decoded again.
+    """
+
+    def __init__(self, faces_dir="Faces/", cache_dir="dataset_cache", workers=None, face_size=(200, 200)):
+        self.faces_dir = faces_dir
+        self.cache_dir = cache_dir
+        self.workers = workers or os.cpu_count() or 4
+        self.face_size = face_size
+        self.faces_file = os.path.join(cache_dir, 'faces.npy')
+        self.ids_file = os.path.join(cache_dir, 'ids.npy')
+        self.index_file = os.path.join(cache_dir, 'index.json')
+        self.skipped = []  # Image paths that could not be decoded on the last load
+
+    def signature(self, dir_name, entry):
+        """Signature of a user directory: directory mtime, newest image mtime and image count."""
+        try:
+            dir_mtime = os.stat(os.path.join(self.faces_dir, dir_name)).st_mtime_ns
+        except OSError:
+            dir_mtime = 0  # Directory vanished, its images will be reported as unreadable
+        newest = max((stamp[0] for stamp in entry["images"].values()), default=0)
+        return [dir_mtime, newest, len(entry["images"])]
+
+    def load_index(self):
+        """Return the cached index, or an empty one if the cache is missing or unreadable."""
+        if not (os.path.isfile(self.index_file) and os.path.isfile(self.faces_file) and os.path.isfile(self.ids_file)):
+            return {}
+        try:
+            with open(self.index_file, 'r') as file:
+                return json.load(file)["users"]
+        except (OSError, ValueError, KeyError):
+            return {}
+
+    def decode(self, img_path):
+        """Read one image as a grayscale face of the cache size, or None if unreadable."""
+        gray_img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
+        if gray_img is None:
+            return None
+        if gray_img.shape != (self.face_size[1], self.face_size[0]):
+            gray_img = cv2.resize(gray_img, self.face_size)
+        return gray_img
+
+    def decode_dirs(self, entries, dir_names):
+        """Decode the images of dir_names in parallel; returns {dir_name: (names, faces)}."""
+        jobs = [(dir_name, img_name) for dir_name in dir_names for img_name in sorted(entries[dir_name]["images"])]
+        paths = [os.path.join(self.faces_dir, dir_name, img_name) for dir_name, img_name in jobs]
+
+        # cv2.imread releases the GIL, so threads decode on every core
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            images = list(pool.map(self.decode, paths))
+
+        decoded = {dir_name: ([], []) for dir_name in dir_names}
+        for (dir_name, img_name), path, image in zip(jobs, paths, images):
+            if image is None:
+                self.skipped.append(path)
+                continue
+            decoded[dir_name][0].append(img_name)
+            decoded[dir_name][1].append(image)
+        return decoded
+
+    def load(self, entries):
+        """Bring the cache in line with entries (from Trainer.scan_faces) and return (faces, ids, index).
+
+        faces is a read-only memory map; index maps dir_name -> {"id", "start", "images", "signature"}.
+        """
+        self.skipped = []
+        index = self.load_index()
+        signatures = {dir_name: self.signature(dir_name, entry) for dir_name, entry in entries.items()}
+        stale = [dir_name for dir_name in entries
+                 if dir_name not in index or index[dir_name]["signature"] != signatures[dir_name]]
+
+        if not stale and set(index) == set(entries):
+            return self.open_arrays() + (index,)
+
+        decoded = self.decode_dirs(entries, stale)
+        self.write_cache(entries, index, decoded, signatures)
+        return self.open_arrays() + (self.load_index(),)
+
+    def open_arrays(self):
+        """Memory-map the packed arrays."""
+        return np.load(self.faces_file, mmap_mode='r'), np.load(self.ids_file)
+
+    def write_cache(self, entries, old_index, decoded, signatures):
+        """Write a new packed cache, reusing rows of unchanged directories from the old one."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        new_index = {}
+        total = 0
+        for dir_name in sorted(entries):
+            if dir_name in decoded:
+                names = decoded[dir_name][0]
+            else:
+                names = old_index[dir_name]["images"]
+            new_index[dir_name] = {"id": entries[dir_name]["id"], "start": total,
+                                   "images": names, "signature": signatures[dir_name]}
+            total += len(names)
+
+        old_faces = np.load(self.faces_file, mmap_mode='r') if old_index else None
+        tmp_faces = self.faces_file + '.tmp.npy'
+        height, width = self.face_size[1], self.face_size[0]
+        faces = np.lib.format.open_memmap(tmp_faces, mode='w+', dtype=np.uint8, shape=(total, height, width))
+        ids = np.empty(total, dtype=np.int32)
+
+        for dir_name, entry in new_index.items():
+            start, count = entry["start"], len(entry["images"])
+            if dir_name in decoded:
+                if count:
+                    faces[start:start + count] = np.stack(decoded[dir_name][1])
+            else:
+                old_start = old_index[dir_name]["start"]
+                faces[start:start + count] = old_faces[old_start:old_start + count]
+            ids[start:start + count] = entry["id"]
+
+        faces.flush()
+        # Release both maps before replacing, Windows can't replace a mapped file
+        del faces, old_faces
+
+        tmp_ids = self.ids_file + '.tmp.npy'
+        np.save(tmp_ids, ids)
+        tmp_index = self.index_file + '.tmp'
+        with open(tmp_index, 'w') as file:
+            json.dump({"version": 1, "users": new_index}, file)
+
+        os.replace(tmp_faces, self.faces_file)
+        os.replace(tmp_ids, self.ids_file)
+        os.replace(tmp_index, self.index_file)
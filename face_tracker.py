@@ -0,0 +1,138 @@
+import time
+import itertools
+import cv2
+
+
+class Track:
+    """A face followed across frames; box is (x, y, w, h) in full-resolution pixels."""
+
+    def __init__(self, track_id, box, small_box, template):
+        self.track_id = track_id
+        self.box = box
+        self.small_box = small_box  # Same box in the downscaled frame
+        self.template = template
+        self.score = 1.0  # Tracking confidence, 1.0 right after a detection
+        self.detected = True  # True when the box came from the cascade this frame
+
+
+def iou(a, b):
+    """Intersection over union of two (x, y, w, h) boxes."""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+
+class DetectionScheduler:
+    """Run the Haar cascade on a downscaled frame every few frames and track faces in between.
+
+    Detection runs every `detect_interval` frames, or on the next frame as soon as a
+    track's template match falls below `min_track_score`. Between detections each face
+    is followed by searching for its template around the last position.
+    """
+
+    def __init__(self, face_cascade, detect_interval=5, detect_scale=0.5, min_track_score=0.6,
+                 search_margin=0.5, scale_factor=1.3, min_neighbors=5):
+        self.face_cascade = face_cascade
+        self.detect_interval = max(1, int(detect_interval))
+        self.detect_scale = detect_scale
+        self.min_track_score = min_track_score
+        self.search_margin = search_margin
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+
+        self.tracks = []
+        self.track_ids = itertools.count(1)
+        self.frames_since_detection = None  # None forces a detection on the first frame
+
+        # Counters for report()
+        self.frames = 0
+        self.detections = 0
+        self.detect_time = 0.0
+        self.track_time = 0.0
+
+    def downscale(self, gray):
+        if self.detect_scale == 1:
+            return gray
+        return cv2.resize(gray, None, fx=self.detect_scale, fy=self.detect_scale, interpolation=cv2.INTER_AREA)
+
+    def to_full(self, small_box, shape):
+        """Map a box from the downscaled frame back to full resolution, clipped to the frame."""
+        x, y, w, h = (int(round(v / self.detect_scale)) for v in small_box)
+        x, y = max(0, x), max(0, y)
+        return (x, y, min(w, shape[1] - x), min(h, shape[0] - y))
+
+    def update(self, gray):
+        """Return the tracks for this grayscale frame with boxes at full resolution."""
+        self.frames += 1
+        small = self.downscale(gray)
+        due = self.frames_since_detection is None or self.frames_since_detection + 1 >= self.detect_interval
+        if due:
+            self.detect(small, gray.shape)
+        else:
+            self.frames_since_detection += 1
+            if not self.track(small, gray.shape):
+                # A face was lost, look for it again right away
+                self.detect(small, gray.shape)
+        return self.tracks
+
+    def detect(self, small, shape):
+        start = time.perf_counter()
+        boxes = self.face_cascade.detectMultiScale(small, self.scale_factor, self.min_neighbors)
+
+        tracks = []
+        unmatched = list(self.tracks)
+        for small_box in (tuple(int(v) for v in box) for box in boxes):
+            # Keep the ID of the track this detection overlaps most
+            best = max(unmatched, key=lambda track: iou(track.small_box, small_box), default=None)
+            if best is not None and iou(best.small_box, small_box) > 0.3:
+                unmatched.remove(best)
+                track_id = best.track_id
+            else:
+                track_id = next(self.track_ids)
+            x, y, w, h = small_box
+            template = small[y:y + h, x:x + w].copy()
+            tracks.append(Track(track_id, self.to_full(small_box, shape), small_box, template))
+
+        self.tracks = tracks
+        self.frames_since_detection = 0
+        self.detections += 1
+        self.detect_time += time.perf_counter() - start
+
+    def track(self, small, shape):
+        """Move every track to its best template match; returns False if any track was lost."""
+        start = time.perf_counter()
+        all_found = True
+        for track in self.tracks:
+            x, y, w, h = track.small_box
+            mx, my = int(w * self.search_margin), int(h * self.search_margin)
+            x0, y0 = max(0, x - mx), max(0, y - my)
+            x1, y1 = min(small.shape[1], x + w + mx), min(small.shape[0], y + h + my)
+            region = small[y0:y1, x0:x1]
+            if region.shape[0] < h or region.shape[1] < w:
+                track.score = 0.0
+            else:
+                scores = cv2.matchTemplate(region, track.template, cv2.TM_CCOEFF_NORMED)
+                _, track.score, _, (dx, dy) = cv2.minMaxLoc(scores)
+                track.small_box = (x0 + dx, y0 + dy, w, h)
+                track.box = self.to_full(track.small_box, shape)
+            track.detected = False
+            if track.score < self.min_track_score:
+                all_found = False
+
+        self.tracks = [track for track in self.tracks if track.score >= self.min_track_score]
+        self.track_time += time.perf_counter() - start
+        return all_found
+
+    def report(self, elapsed=None):
+        """One line summary of detection load and, given the elapsed time, the frame rate."""
+        summary = (f"{self.frames} frames, cascade on {self.detections} "
+                   f"({100.0 * self.detections / max(1, self.frames):.0f}%), "
+                   f"detect {1000.0 * self.detect_time / max(1, self.detections):.1f} ms, "
+                   f"track {1000.0 * self.track_time / max(1, self.frames - self.detections):.1f} ms")
+        if elapsed:
+            summary = f"{self.frames / elapsed:.1f} FPS, " + summary
+        return summary
@@ -0,0 +1,122 @@
+import queue
+import threading
+from instrumentation import StageTimer
+
+
+class FramePipeline:
+    """Capture -> process -> display pipeline connected by bounded queues.
+
+    A capture thread reads frames from `cap`, a worker thread runs `process` on them
+    and the caller's thread pulls finished frames with `results()` for display (OpenCV
+    and Tk windows must stay on the thread that created them).
+
+    drop_policy decides what happens when processing falls behind:
+      "oldest" - discard the oldest queued frame so the freshest one is processed (live cameras)
+      "newest" - discard the incoming frame and keep what is queued
+      "block"  - wait for the worker, no frame is lost (video files)
+    """
+
+    DROP_POLICIES = ("oldest", "newest", "block")
+
+    def __init__(self, cap, process, queue_size=1, drop_policy="oldest", timer=None):
+        if drop_policy not in self.DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.cap = cap
+        self.process = process
+        self.drop_policy = drop_policy
+        self.timer = timer or StageTimer()
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.processed = queue.Queue(maxsize=queue_size)
+        self.stop_event = threading.Event()
+        self.capture_done = threading.Event()
+        self.process_done = threading.Event()
+        self.error = None  # First exception raised by a stage, re-raised by results()
+        self.capture_failed = False  # True when cap.read() stopped returning frames
+
+        # Counters for reporting
+        self.captured = 0
+        self.dropped = 0
+        self.completed = 0
+
+        self.threads = [
+            threading.Thread(target=self.capture_loop, name="frame-capture", daemon=True),
+            threading.Thread(target=self.process_loop, name="frame-process", daemon=True),
+        ]
+
+    def put(self, target, item):
+        """Put item on target according to the drop policy; returns False when the pipeline stops."""
+        while not self.stop_event.is_set():
+            if self.drop_policy == "block":
+                try:
+                    target.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            try:
+                target.put_nowait(item)
+                return True
+            except queue.Full:
+                self.dropped += 1
+                if self.drop_policy == "newest":
+                    return True
+                try:
+                    target.get_nowait()  # Make room for the fresher item
+                except queue.Empty:
+                    pass
+        return False
+
+    def capture_loop(self):
+        try:
+            while not self.stop_event.is_set():
+                with self.timer.stage("read"):
+                    ret, frame = self.cap.read()
+                if not ret:
+                    self.capture_failed = True
+                    break
+                self.captured += 1
+                if not self.put(self.frames, frame):
+                    break
+        except Exception as e:
+            self.error = self.error or e
+        finally:
+            self.capture_done.set()
+
+    def process_loop(self):
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    frame = self.frames.get(timeout=0.1)
+                except queue.Empty:
+                    if self.capture_done.is_set():
+                        break
+                    continue
+                result = self.process(frame)
+                self.completed += 1
+                if not self.put(self.processed, result):
+                    break
+        except Exception as e:
+            self.error = self.error or e
+        finally:
+            self.process_done.set()
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def results(self):
+        """Yield processed frames on the calling thread until the source ends or stop() is called."""
+        while not self.stop_event.is_set():
+            try:
+                yield self.processed.get(timeout=0.1)
+            except queue.Empty:
+                if self.process_done.is_set() and self.processed.empty():
+                    break
+        if self.error is not None:
+            raise self.error
+
+    def stop(self):
+        """Stop all stages and wait for the worker threads."""
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join(timeout=2)
@@ -0,0 +1,69 @@
+import os
+import cv2
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+class CameraSource:
+    """Live camera; frames that are not read in time are lost, so consumers may drop frames."""
+
+    is_live = True
+
+    def __init__(self, camera_index=0):
+        self.cap = cv2.VideoCapture(camera_index)
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        return self.cap.read()
+
+    def release(self):
+        self.cap.release()
+
+
+class VideoFileSource(CameraSource):
+    """Recorded video; every frame is delivered, as fast as the consumer reads them."""
+
+    is_live = False
+
+    def __init__(self, path):
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"Video file {path} not found")
+        self.cap = cv2.VideoCapture(path)
+
+
+class ImageDirectorySource:
+    """A directory of images read in file name order as a frame sequence."""
+
+    is_live = False
+
+    def __init__(self, path):
+        self.paths = sorted(os.path.join(path, name) for name in os.listdir(path)
+                            if name.lower().endswith(IMAGE_EXTENSIONS))
+        self.position = 0
+
+    def isOpened(self):
+        return self.position < len(self.paths)
+
+    def read(self):
+        while self.position < len(self.paths):
+            frame = cv2.imread(self.paths[self.position])
+            self.position += 1
+            if frame is not None:
+                return True, frame
+        return False, None
+
+    def release(self):
+        self.position = len(self.paths)
+
+
+def open_source(source=0):
+    """Open a frame source from a camera index, a video file, an image directory or a source object."""
+    if hasattr(source, 'read'):
+        return source
+    if isinstance(source, int) or (isinstance(source, str) and source.isdigit()):
+        return CameraSource(int(source))
+    if os.path.isdir(source):
+        return ImageDirectorySource(source)
+    return VideoFileSource(source)
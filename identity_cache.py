@@ -0,0 +1,91 @@
+import collections
+from face_tracker import iou
+
+UNKNOWN = -1  # Vote of a face above the threshold, or too close to call between two people
+
+
+class TrackIdentity:
+    """Recent predictions of one tracked face and the label they agreed on."""
+
+    def __init__(self, window):
+        self.votes = collections.deque(maxlen=window)  # (label or UNKNOWN, distance)
+        self.label = None  # Committed label, UNKNOWN for a stranger, None while still voting
+        self.distance = None  # Mean distance of the votes for label
+        self.box = None  # Box at the last prediction
+        self.frames_since_predict = 0
+
+    @property
+    def settled(self):
+        """A label is committed and the latest prediction agrees with it."""
+        return self.label is not None and self.votes[-1][0] == self.label
+
+    def add_vote(self, label, distance, box, min_votes):
+        self.votes.append((label, distance))
+        self.box = box
+        self.frames_since_predict = 0
+        best, count = collections.Counter(vote for vote, _ in self.votes).most_common(1)[0]
+        if count >= min_votes:
+            self.label = best
+            self.distance = sum(d for vote, d in self.votes if vote == best) / count
+
+
+class IdentityCache:
+    """Label per tracked face, from votes over its last `window` predictions.
+
+    A label is committed once min_votes predictions in the window agree on it, so a single
+    misread neither names a face nor flips a known one. A settled face is predicted again
+    only every reverify_interval frames, or as soon as its box moved away from where it was
+    last predicted (IoU below min_iou). Faces still voting, or whose last prediction
+    disagreed with their label, are predicted every frame.
+    """
+
+    def __init__(self, window=5, min_votes=3, reverify_interval=15, min_iou=0.5):
+        if not 1 <= min_votes <= window:
+            raise ValueError(f"min_votes must be between 1 and the window of {window} predictions")
+        self.window = window
+        self.min_votes = min_votes
+        self.reverify_interval = reverify_interval
+        self.min_iou = min_iou
+        self.states = {}
+        # Counters for report()
+        self.faces = 0
+        self.predictions = 0
+
+    def needs_predict(self, track):
+        state = self.states.get(track.track_id)
+        if state is None or not state.settled:
+            return True
+        if state.frames_since_predict >= self.reverify_interval:
+            return True
+        return iou(state.box, track.box) < self.min_iou
+
+    def update(self, tracks, predicted):
+        """Record this frame: predicted maps track IDs to (label or UNKNOWN, distance) of the
+        faces that were predicted; the other tracks keep their label."""
+        self.faces += len(tracks)
+        self.predictions += len(predicted)
+        for track in tracks:
+            state = self.states.get(track.track_id)
+            if state is None:
+                state = self.states[track.track_id] = TrackIdentity(self.window)
+            if track.track_id in predicted:
+                label, distance = predicted[track.track_id]
+                state.add_vote(label, distance, track.box, self.min_votes)
+            else:
+                state.frames_since_predict += 1
+
+    def identity(self, track_id):
+        """The committed state of a tracked face, or None if it is not (yet) known as a user."""
+        state = self.states.get(track_id)
+        if state is None or state.label is None or state.label == UNKNOWN:
+            return None
+        return state
+
+    def prune(self, track_ids):
+        """Forget faces that are no longer tracked."""
+        for track_id in self.states.keys() - set(track_ids):
+            del self.states[track_id]
+
+    def report(self):
+        share = 100.0 * self.predictions / self.faces if self.faces else 0.0
+        return f"predict on {self.predictions} of {self.faces} faces ({share:.0f}%)"
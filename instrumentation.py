@@ -0,0 +1,124 @@
+import os
+import csv
+import json
+import time
+import threading
+import contextlib
+from collections import deque
+import numpy as np
+import cv2
+
+# Returned by StageTimer.stage() when timing is off, so a disabled timer costs one call
+NULL_STAGE = contextlib.nullcontext()
+
+
+class Stage:
+    """Context manager that records how long its block took under a stage name."""
+
+    __slots__ = ("timer", "name", "start")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class StageTimer:
+    """Rolling latency histograms per loop stage, an optional FPS overlay and periodic snapshots.
+
+    Wrap each stage in `with timer.stage("detect"):` and call frame_done() once per frame.
+    The last `window` samples of every stage are kept for p50/p95/p99. Snapshots go to
+    snapshot_path every snapshot_interval seconds, as JSON (one object per line) or as CSV
+    rows, depending on the file extension.
+    """
+
+    def __init__(self, enabled=False, window=300, overlay=False, snapshot_path=None, snapshot_interval=10.0):
+        self.enabled = enabled
+        self.window = window
+        self.overlay = overlay and enabled
+        self.snapshot_path = snapshot_path if enabled else None
+        self.snapshot_interval = snapshot_interval
+        self.samples = {}
+        self.frame_times = deque(maxlen=window)
+        self.lock = threading.Lock()  # Stages run on the capture, processing and display threads
+        self.last_snapshot = time.perf_counter()
+        self.overlay_lines = []
+        self.overlay_updated = 0.0
+
+    def stage(self, name):
+        if not self.enabled:
+            return NULL_STAGE
+        return Stage(self, name)
+
+    def record(self, name, seconds):
+        with self.lock:
+            samples = self.samples.get(name)
+            if samples is None:
+                samples = self.samples[name] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def frame_done(self):
+        """Mark the end of a displayed frame; writes a snapshot when one is due."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.frame_times.append(now)
+        if self.snapshot_path and now - self.last_snapshot >= self.snapshot_interval:
+            self.last_snapshot = now
+            self.write_snapshot()
+
+    def fps(self):
+        if len(self.frame_times) < 2:
+            return 0.0
+        return (len(self.frame_times) - 1) / (self.frame_times[-1] - self.frame_times[0])
+
+    def summary(self):
+        """{stage: {"count", "p50_ms", "p95_ms", "p99_ms"}} over the rolling window."""
+        with self.lock:
+            stages = {name: np.array(samples) * 1000.0 for name, samples in self.samples.items() if samples}
+        summary = {}
+        for name, values in stages.items():
+            p50, p95, p99 = np.percentile(values, (50, 95, 99))
+            summary[name] = {"count": len(values), "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99)}
+        return summary
+
+    def write_snapshot(self):
+        timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
+        summary = self.summary()
+        fps = self.fps()
+        if self.snapshot_path.lower().endswith('.csv'):
+            new_file = not os.path.isfile(self.snapshot_path)
+            with open(self.snapshot_path, mode='a', newline='') as file:
+                writer = csv.writer(file)
+                if new_file:
+                    writer.writerow(['Time', 'FPS', 'Stage', 'Count', 'p50_ms', 'p95_ms', 'p99_ms'])
+                for name, stats in summary.items():
+                    writer.writerow([timestamp, f"{fps:.1f}", name, stats["count"], f"{stats['p50_ms']:.2f}",
+                                     f"{stats['p95_ms']:.2f}", f"{stats['p99_ms']:.2f}"])
+        else:
+            with open(self.snapshot_path, mode='a') as file:
+                file.write(json.dumps({"time": timestamp, "fps": fps, "stages": summary}) + "\n")
+
+    def draw_overlay(self, frame, origin=(10, 20)):
+        """Draw FPS and per-stage p50/p95 starting at origin, refreshed twice a second."""
+        if not self.overlay:
+            return
+        now = time.perf_counter()
+        if now - self.overlay_updated > 0.5:
+            self.overlay_updated = now
+            self.overlay_lines = [f"FPS {self.fps():.1f}"] + [
+                f"{name}: {stats['p50_ms']:.1f}/{stats['p95_ms']:.1f} ms" for name, stats in self.summary().items()]
+        for i, line in enumerate(self.overlay_lines):
+            cv2.putText(frame, line, (origin[0], origin[1] + 18 * i), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+
+    def close(self):
+        """Write a final snapshot."""
+        if self.snapshot_path and self.samples:
+            self.write_snapshot()
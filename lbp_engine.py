@@ -0,0 +1,357 @@
+import os
+import json
+import time
+import numpy as np
+import cv2
+
+ENGINES = ("opencv", "numpy")
+MODEL_FILES = {"opencv": "trainer.yml", "numpy": "trainer.lbph"}
+
+# Binary model file: a fixed header, then labels, unique labels, label starts, row sums and the
+# column-major float32 histogram matrix, each section starting on a 64-byte boundary
+MODEL_MAGIC = b"LBPHMAP1"
+MODEL_HEADER = np.dtype([("magic", "S8"), ("radius", "<i4"), ("neighbors", "<i4"), ("grid_x", "<i4"),
+                         ("grid_y", "<i4"), ("rows", "<i8"), ("cols", "<i8"), ("n_labels", "<i8")])
+MODEL_ALIGN = 64
+
+
+def create_recognizer(engine="opencv"):
+    """Create an LBPH recognizer for the given engine name."""
+    if engine == "numpy":
+        return LBPHRecognizer()
+    if engine == "opencv":
+        return cv2.face.LBPHFaceRecognizer_create()
+    raise ValueError(f"Unknown recognizer engine: {engine}")
+
+
+def version_file(model_file):
+    return model_file + ".version"
+
+
+def read_marker(model_file):
+    """Contents of a model's version marker, {} if it was never published."""
+    try:
+        with open(version_file(model_file)) as file:
+            marker = json.load(file)
+        return marker if isinstance(marker, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def model_version(model_file):
+    """Version number of a published model, 0 if it was never published."""
+    try:
+        return int(read_marker(model_file).get("version", 0))
+    except (ValueError, TypeError):
+        return 0
+
+
+def current_model_file(model_file):
+    """Path of the current version of a model, or None if the model was retracted.
+
+    Models published by earlier versions (or never published) are model_file itself.
+    """
+    marker = read_marker(model_file)
+    if "file" not in marker:
+        return model_file
+    if marker["file"] is None:
+        return None
+    return os.path.join(os.path.dirname(model_file), marker["file"])
+
+
+def write_marker(model_file, version, file_name):
+    marker = version_file(model_file)
+    with open(marker + ".tmp", "w") as file:
+        json.dump({"version": version, "file": file_name, "saved": time.strftime('%Y-%m-%d %H:%M:%S')}, file)
+    os.replace(marker + ".tmp", marker)
+
+
+def remove_old_versions(model_file, keep=()):
+    """Delete versioned files of a model except the versions in keep.
+
+    Windows refuses to delete a file that is still memory-mapped; such files are left for
+    a later call, once the recognizers that mapped them have moved on.
+    """
+    name, ext = os.path.splitext(model_file)
+    prefix = os.path.basename(name) + "."
+    directory = os.path.dirname(model_file) or "."
+    for file_name in os.listdir(directory):
+        number = file_name[len(prefix):-len(ext)] if file_name.startswith(prefix) and file_name.endswith(ext) else ""
+        if number.isdigit() and int(number) not in keep:
+            try:
+                os.remove(os.path.join(directory, file_name))
+            except OSError:
+                pass
+
+
+def publish_model(recognizer, model_file):
+    """Save a model atomically and bump its version marker; returns the new version.
+
+    The model is written to a temporary file and renamed into place, so a reader never sees
+    a half-written model. Memory-mapped (numpy engine) models get a new file per version,
+    trainer.<version>.lbph, since a mapped file can't be replaced on Windows; the marker
+    names the current file and older versions are deleted once no longer mapped. The
+    marker is renamed in last, so a reader that sees version N loads model N or newer.
+    """
+    version = model_version(model_file) + 1
+    # Keep the extension last, OpenCV picks the file format from it
+    name, ext = os.path.splitext(model_file)
+    versioned = isinstance(recognizer, LBPHRecognizer)
+    target = f"{name}.{version}{ext}" if versioned else model_file
+    tmp_file = f"{name}.tmp{ext}"
+    recognizer.save(tmp_file)
+    os.replace(tmp_file, target)
+    write_marker(model_file, version, os.path.basename(target))
+
+    if versioned:
+        # The previous version stays, a reader may have just read the old marker
+        remove_old_versions(model_file, keep=(version, version - 1))
+        if os.path.isfile(model_file):
+            try:
+                os.remove(model_file)  # Unversioned file of earlier releases
+            except OSError:
+                pass
+    return version
+
+
+def retract_model(model_file):
+    """Publish "no model" as a new version (e.g. after the last user was deleted) and delete the files.
+
+    The version keeps counting up, so running recognizers notice and drop their model.
+    """
+    version = model_version(model_file) + 1
+    write_marker(model_file, version, None)
+    remove_old_versions(model_file)
+    if os.path.isfile(model_file):
+        try:
+            os.remove(model_file)
+        except OSError:
+            pass  # Still mapped on Windows; the marker already says there is no model
+    return version
+
+
+def load_model(engine="opencv", model_file=None):
+    """Create a recognizer for engine and read the current version of its model."""
+    path = current_model_file(model_file or MODEL_FILES[engine])
+    if path is None:
+        raise FileNotFoundError("There is no trained model, capture faces and train first")
+    recognizer = create_recognizer(engine)
+    recognizer.read(path)
+    return recognizer
+
+
+def model_sections(rows, cols, n_labels):
+    """Byte offset, dtype and shape of every array in a binary model file."""
+    sections = {}
+    offset = MODEL_HEADER.itemsize
+    for name, dtype, shape in (("labels", "<i4", (rows,)), ("unique_labels", "<i4", (n_labels,)),
+                               ("label_starts", "<i8", (n_labels,)), ("row_sums", "<f4", (rows,)),
+                               ("histograms", "<f4", (rows, cols))):
+        offset = -(-offset // MODEL_ALIGN) * MODEL_ALIGN
+        sections[name] = (offset, np.dtype(dtype), shape)
+        offset += int(np.prod(shape)) * np.dtype(dtype).itemsize
+    return sections, offset
+
+
+def from_opencv(model):
+    """An LBPHRecognizer holding the histograms and labels of a trained cv2.face LBPH model."""
+    recognizer = LBPHRecognizer(model.getRadius(), model.getNeighbors(), model.getGridX(), model.getGridY())
+    histograms = model.getHistograms()
+    if len(histograms):
+        recognizer.set_model(np.concatenate([h.reshape(1, -1) for h in histograms]), model.getLabels())
+    return recognizer
+
+
+def convert_opencv_model(src, dst):
+    """Write an OpenCV trainer.yml as a binary model for the numpy engine; returns the recognizer."""
+    model = cv2.face.LBPHFaceRecognizer_create()
+    model.read(src)
+    recognizer = from_opencv(model)
+    publish_model(recognizer, dst)
+    return recognizer
+
+
+def elbp(src, radius=1, neighbors=8):
+    """Extended (circular) local binary patterns of a grayscale image, as computed by OpenCV's LBPH."""
+    src = np.asarray(src)
+    rows, cols = src.shape
+    center = src[radius:rows - radius, radius:cols - radius].astype(np.float32)
+    dst = np.zeros(center.shape, dtype=np.int32)
+    eps = np.finfo(np.float32).eps
+
+    for n in range(neighbors):
+        # Sample point on the circle and bilinear interpolation weights
+        x = radius * np.cos(2.0 * np.pi * n / neighbors)
+        y = -radius * np.sin(2.0 * np.pi * n / neighbors)
+        fx, fy = int(np.floor(x)), int(np.floor(y))
+        cx, cy = int(np.ceil(x)), int(np.ceil(y))
+        tx, ty = np.float32(x - fx), np.float32(y - fy)
+        w1 = (1 - tx) * (1 - ty)
+        w2 = tx * (1 - ty)
+        w3 = (1 - tx) * ty
+        w4 = tx * ty
+
+        def shifted(dy, dx):
+            return src[radius + dy:rows - radius + dy, radius + dx:cols - radius + dx].astype(np.float32)
+
+        t = w1 * shifted(fy, fx) + w2 * shifted(fy, cx) + w3 * shifted(cy, fx) + w4 * shifted(cy, cx)
+        dst += (((t > center) | (np.abs(t - center) < eps)).astype(np.int32) << n)
+    return dst
+
+
+def spatial_histogram(lbp, num_patterns=256, grid_x=8, grid_y=8):
+    """Concatenated, per-cell normalized histograms of an LBP image as one float32 row."""
+    height, width = lbp.shape[0] // grid_y, lbp.shape[1] // grid_x
+    cells = lbp[:grid_y * height, :grid_x * width].reshape(grid_y, height, grid_x, width)
+    cells = cells.transpose(0, 2, 1, 3).reshape(grid_y * grid_x, height * width)
+
+    # One bincount for all cells by offsetting each cell into its own block of bins
+    offsets = (np.arange(grid_y * grid_x) * num_patterns)[:, None]
+    counts = np.bincount((cells + offsets).ravel(), minlength=grid_y * grid_x * num_patterns)
+    return (counts / np.float32(height * width)).astype(np.float32)
+
+
+class LBPHRecognizer:
+    """NumPy LBPH recognizer with the same interface as cv2.face.LBPHFaceRecognizer.
+
+    Training histograms are kept in one contiguous (column-major) float32 matrix, sorted
+    by label, so a batch of faces is scored against the whole model in one call of
+    vectorized chi-square passes and the best distance per label falls out of a single
+    reduceat.
+    """
+
+    def __init__(self, radius=1, neighbors=8, grid_x=8, grid_y=8, threshold=np.inf):
+        self.radius = radius
+        self.neighbors = neighbors
+        self.grid_x = grid_x
+        self.grid_y = grid_y
+        self.threshold = threshold
+        self.histograms = np.empty((0, grid_x * grid_y * (1 << neighbors)), dtype=np.float32)
+        self.labels = np.empty(0, dtype=np.int32)
+        self.label_starts = np.empty(0, dtype=np.intp)  # First row of each label in histograms
+        self.unique_labels = np.empty(0, dtype=np.int32)
+        self.row_sums = np.empty(0, dtype=np.float32)
+
+    def compute_histogram(self, face):
+        lbp = elbp(face, self.radius, self.neighbors)
+        return spatial_histogram(lbp, 1 << self.neighbors, self.grid_x, self.grid_y)
+
+    def compute_histograms(self, faces):
+        return np.stack([self.compute_histogram(face) for face in faces]) if len(faces) else \
+            np.empty((0, self.histograms.shape[1]), dtype=np.float32)
+
+    def set_model(self, histograms, labels):
+        """Install a model, keeping rows grouped by label."""
+        labels = np.asarray(labels, dtype=np.int32).ravel()
+        order = np.argsort(labels, kind='stable')
+        # Column-major, so the bins a query needs are contiguous runs
+        self.histograms = np.asfortranarray(histograms[order], dtype=np.float32)
+        self.labels = labels[order]
+        self.unique_labels, self.label_starts = np.unique(self.labels, return_index=True)
+        self.row_sums = self.histograms.sum(axis=1)
+
+    def train(self, faces, labels):
+        self.set_model(self.compute_histograms(faces), labels)
+
+    def update(self, faces, labels):
+        histograms = np.concatenate([self.histograms, self.compute_histograms(faces)])
+        self.set_model(histograms, np.concatenate([self.labels, np.asarray(labels, dtype=np.int32).ravel()]))
+
+    def empty(self):
+        return len(self.labels) == 0
+
+    def getHistograms(self):
+        return list(self.histograms[:, None, :])
+
+    def getLabels(self):
+        return self.labels[:, None]
+
+    def chi_square(self, queries, chunk_elements=1 << 24):
+        """Chi-square (HISTCMP_CHISQR_ALT) distance of each query row to every training row.
+
+        Bins where the query is zero contribute exactly the training value, so only the
+        query's non-zero bins are compared element-wise; the rest comes from row sums.
+        """
+        dists = np.empty((len(queries), len(self.histograms)), dtype=np.float32)
+        for i, query in enumerate(queries):
+            nonzero = np.flatnonzero(query)
+            values = query[nonzero]
+            # Bound the temporary (chunk, nonzero) arrays
+            chunk = max(1, chunk_elements // max(1, len(nonzero)))
+            for start in range(0, len(self.histograms), chunk):
+                h = self.histograms[start:start + chunk, nonzero]
+                total = h + values
+                rest = self.row_sums[start:start + chunk] - h.sum(axis=1)
+                np.subtract(h, values, out=h)
+                np.multiply(h, h, out=h)
+                np.divide(h, total, out=h)
+                dists[i, start:start + chunk] = 2 * (h.sum(axis=1, dtype=np.float64) + rest)
+        return dists
+
+    def predict_batch(self, faces, k=1):
+        """Score all faces in one pass; returns (labels, distances), each of shape (len(faces), k).
+
+        Entries past the number of known labels, or beyond the threshold, are -1 / inf.
+        """
+        n = len(faces)
+        labels = np.full((n, k), -1, dtype=np.int32)
+        distances = np.full((n, k), np.inf, dtype=np.float32)
+        if n == 0 or self.empty():
+            return labels, distances
+
+        # Best distance per label, then the k closest labels
+        per_label = np.minimum.reduceat(self.chi_square(self.compute_histograms(faces)), self.label_starts, axis=1)
+        top = min(k, per_label.shape[1])
+        order = np.argsort(per_label, axis=1)[:, :top]
+        best = np.take_along_axis(per_label, order, axis=1)
+        accepted = best < self.threshold
+        labels[:, :top] = np.where(accepted, self.unique_labels[order], -1)
+        distances[:, :top] = np.where(accepted, best, np.inf)
+        return labels, distances
+
+    def predict(self, face):
+        labels, distances = self.predict_batch([face])
+        distance = float(distances[0, 0])
+        if not np.isfinite(distance):
+            distance = float(np.finfo(np.float64).max)  # What OpenCV reports when nothing matches
+        return int(labels[0, 0]), distance
+
+    def save(self, filename):
+        """Write the binary model file (see MODEL_HEADER); the arrays are stored ready to be mapped."""
+        rows, cols = self.histograms.shape
+        header = np.array([(MODEL_MAGIC, self.radius, self.neighbors, self.grid_x, self.grid_y,
+                            rows, cols, len(self.unique_labels))], dtype=MODEL_HEADER)
+        sections, size = model_sections(rows, cols, len(self.unique_labels))
+        with open(filename, 'wb') as file:
+            file.write(header.tobytes())
+            for name, (offset, dtype, shape) in sections.items():
+                file.seek(offset)
+                # Fortran order writes the histogram matrix column by column, as it is kept in memory
+                file.write(np.asarray(getattr(self, name), dtype=dtype).tobytes(order='F'))
+            file.truncate(size)
+
+    def read(self, filename):
+        """Map a binary model file; nothing is parsed or copied, so loading takes the same time at any size.
+
+        Models saved by earlier versions as .npz archives are still read (and loaded into memory).
+        """
+        with open(filename, 'rb') as file:
+            header = np.frombuffer(file.read(MODEL_HEADER.itemsize), dtype=MODEL_HEADER)
+        if len(header) == 0 or header["magic"][0] != MODEL_MAGIC:
+            with np.load(filename) as data:
+                self.radius, self.neighbors, self.grid_x, self.grid_y = (int(v) for v in data["params"])
+                self.set_model(data["histograms"], data["labels"])
+            return
+
+        header = header[0]
+        self.radius, self.neighbors, self.grid_x, self.grid_y = (int(header[name]) for name in
+                                                                 ("radius", "neighbors", "grid_x", "grid_y"))
+        sections, size = model_sections(int(header["rows"]), int(header["cols"]), int(header["n_labels"]))
+        if os.path.getsize(filename) < size:
+            raise ValueError(f"Model file {filename} is truncated")
+        for name, (offset, dtype, shape) in sections.items():
+            if not all(shape):
+                setattr(self, name, np.zeros(shape, dtype=dtype))  # A zero-length file section can't be mapped
+                continue
+            # Read-only maps: processes loading the same model share its pages
+            setattr(self, name, np.memmap(filename, dtype=dtype, mode='r', offset=offset, shape=shape, order='F'))
@@ -0,0 +1,86 @@
+import itertools
+import numpy as np
+
+# Face mesh landmarks compared by the eyebrow movement check
+LEFT_EYEBROW = 105
+LEFT_EYE = 33
+RIGHT_EYEBROW = 334
+RIGHT_EYE = 263
+NOSE_TIP = 1
+
+
+def landmarks_to_array(face_landmarks):
+    """(n, 2) float32 array of a face mesh result's normalized x, y, read in a single pass."""
+    points = face_landmarks.landmark
+    coords = itertools.chain.from_iterable((point.x, point.y) for point in points)
+    return np.fromiter(coords, dtype=np.float32, count=2 * len(points)).reshape(-1, 2)
+
+
+def eyebrow_ratio(landmarks):
+    """Eyebrow-to-eye height over eye-to-nose height, averaged over both sides.
+
+    Both are vertical distances within the face, so the face size, the box and tilting a
+    flat photo scale them alike and the ratio only changes when the eyebrows move.
+    """
+    eyes = (landmarks[LEFT_EYE, 1] + landmarks[RIGHT_EYE, 1]) / 2
+    brows = (landmarks[LEFT_EYEBROW, 1] + landmarks[RIGHT_EYEBROW, 1]) / 2
+    face_height = abs(landmarks[NOSE_TIP, 1] - eyes)
+    return float(abs(eyes - brows) / face_height) if face_height > 0 else None
+
+
+class LivenessState:
+    """Liveness of one tracked face: eyebrow ratios (see eyebrow_ratio) of the last frames.
+
+    The resting ratio is the median of the buffer. The face passes once the ratio rose
+    more than `rise` (relative) above it and then came back down to within half of that,
+    i.e. the eyebrows went up and down again.
+    """
+
+    def __init__(self, user_id, window, rise, min_samples=3):
+        self.user_id = user_id
+        self.ratios = np.zeros(window, dtype=np.float32)
+        self.count = 0
+        self.rise = rise
+        self.min_samples = min_samples
+        self.baseline = None  # Resting ratio, frozen while the eyebrows are raised
+        self.raised = False
+        self.verified = False
+        self.landmarks = None  # Last mesh result, normalized to the face box, reused once verified
+
+    def observe(self, landmarks):
+        """Add a mesh result; returns True when this face is verified."""
+        self.landmarks = landmarks
+        ratio = eyebrow_ratio(landmarks)
+        if ratio is None or self.verified:
+            return self.verified
+        if self.baseline is not None:
+            if ratio > self.baseline * (1 + self.rise):
+                self.raised = True
+            elif self.raised and ratio < self.baseline * (1 + self.rise / 2):
+                self.verified = True
+        if not self.raised:
+            self.ratios[self.count % len(self.ratios)] = ratio
+            self.count += 1
+            if self.count >= self.min_samples:
+                self.baseline = float(np.median(self.ratios[:min(self.count, len(self.ratios))]))
+        return self.verified
+
+
+class LivenessTracker:
+    """Liveness state per tracked face, dropped when the track ends or is recognized as someone else."""
+
+    def __init__(self, window=15, rise=0.15):
+        self.window = window
+        self.rise = rise
+        self.states = {}
+
+    def state(self, track_id, user_id):
+        state = self.states.get(track_id)
+        if state is None or state.user_id != user_id:
+            state = self.states[track_id] = LivenessState(user_id, self.window, self.rise)
+        return state
+
+    def prune(self, track_ids):
+        """Forget faces that are no longer tracked."""
+        for track_id in self.states.keys() - set(track_ids):
+            del self.states[track_id]
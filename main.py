@@ -1,12 +1,17 @@
 import os
-import csv
 import shutil  # To delete a directory and its contents
-from datetime import datetime
+from datetime import datetime, timedelta
 import tkinter as tk
-from tkinter import ttk, messagebox
-from PIL import Image, ImageDraw, ImageFont
+from tkinter import ttk, messagebox, filedialog
 import tempfile
-import win32api
+import cv2
+from PIL import Image, ImageTk
+import export
+from storage import AttendanceDatabase
+from data_view import TableModel, ChunkedTreeviewLoader
+from task_executor import TaskExecutor
+
+WATCH_INTERVAL_MS = 1000  # How often the database is checked for changes made by other connections
 
 
 class SmartAttendanceSystem:
@@ -14,6 +19,9 @@ class SmartAttendanceSystem:
         self.root = root
         self.root.title("Smart Attendance System")
 
+        # Users and attendance are stored in an indexed SQLite database
+        self.db = AttendanceDatabase()
+
         # Set minimum window size to ensure responsiveness
         self.root.minsize(800, 500)
 
@@ -22,7 +30,7 @@ class SmartAttendanceSystem:
         self.operations_frame.pack(side=tk.TOP, fill=tk.X, expand=False, padx=10, pady=10)
 
         # Configure the grid to stretch widgets in the operations frame
-        self.operations_frame.columnconfigure((0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10), weight=1)
+        self.operations_frame.columnconfigure((0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12), weight=1)
 
         # ID Label and Entry
         self.id_label = ttk.Label(self.operations_frame, text="ID:")
@@ -71,14 +79,54 @@ class SmartAttendanceSystem:
         self.print_button = ttk.Button(self.operations_frame, text="Print", command=self.print_data)
         self.print_button.grid(row=0, column=9, padx=5, pady=5, sticky="ew")
 
+        # Export Button
+        self.export_button = ttk.Button(self.operations_frame, text="Export", command=self.export_data)
+        self.export_button.grid(row=0, column=10, padx=5, pady=5, sticky="ew")
+
+        # Reports Button
+        self.reports_button = ttk.Button(self.operations_frame, text="Reports", command=self.open_reports)
+        self.reports_button.grid(row=0, column=11, padx=5, pady=5, sticky="ew")
+
         # Exit Button
         self.exit_button = ttk.Button(self.operations_frame, text="Exit", command=self.exit_application)
-        self.exit_button.grid(row=0, column=10, padx=5, pady=5, sticky="ew")
+        self.exit_button.grid(row=0, column=12, padx=5, pady=5, sticky="ew")
+
+        # Attendance analytics, built on first use of the Reports window
+        self.analytics = None
+        self.reports_window = None
+
+        # Status bar for background jobs: message, progress and a Cancel button
+        self.status_frame = ttk.Frame(self.root)
+        self.status_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=(0, 10))
+        self.status_label = ttk.Label(self.status_frame, text="Ready")
+        self.status_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.cancel_button = ttk.Button(self.status_frame, text="Cancel", state=tk.DISABLED, command=self.cancel_task)
+        self.cancel_button.pack(side=tk.RIGHT, padx=5)
+        self.progress_bar = ttk.Progressbar(self.status_frame, length=200, mode="determinate")
+        self.progress_bar.pack(side=tk.RIGHT, padx=5)
+
+        # Capture, training and recognition run on worker threads, one job at a time
+        # Their camera frames are shown in a Tk preview window, OpenCV windows are not thread-safe
+        self.executor = TaskExecutor(self.root, poll_interval_ms=30, on_notify=self.show_task_message,
+                                     on_frame=self.show_task_frame)
+        self.preview_window = None
 
         # Create the bottom frame for Data
         self.data_frame = ttk.LabelFrame(self.root, text="Data")
         self.data_frame.pack(side=tk.TOP, fill=tk.BOTH, expand=True, padx=10, pady=10)
 
+        # Filter Entry and row count above the Treeview
+        self.filter_frame = ttk.Frame(self.data_frame)
+        self.filter_frame.pack(fill=tk.X, pady=(0, 5))
+        ttk.Label(self.filter_frame, text="Filter:").pack(side=tk.LEFT, padx=5)
+        self.filter_var = tk.StringVar()
+        self.filter_var.trace_add("write", self.on_filter_changed)
+        self.filter_entry = ttk.Entry(self.filter_frame, textvariable=self.filter_var)
+        self.filter_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        self.row_count_label = ttk.Label(self.filter_frame, text="")
+        self.row_count_label.pack(side=tk.RIGHT, padx=5)
+        self.filter_job = None
+
         # Create Treeview with Scrollbars in Data frame
         self.tree_frame = ttk.Frame(self.data_frame)
         self.tree_frame.pack(fill=tk.BOTH, expand=True)
@@ -97,89 +145,294 @@ class SmartAttendanceSystem:
         self.v_scrollbar.config(command=self.treeview.yview)
         self.h_scrollbar.config(command=self.treeview.xview)
 
-        self.treeview.heading("ID", text="ID")
-        self.treeview.heading("Name", text="Name")
-        self.treeview.heading("Time", text="Time")
+        # Clicking a heading sorts by that column; clicking it again reverses the order
+        self.treeview.heading("ID", text="ID", command=lambda: self.sort_treeview(0))
+        self.treeview.heading("Name", text="Name", command=lambda: self.sort_treeview(1))
+        self.treeview.heading("Time", text="Time", command=lambda: self.sort_treeview(2))
+
+        # Rows live in an in-memory model and are inserted into the Treeview in batches
+        self.table = TableModel()
+        self.tree_loader = ChunkedTreeviewLoader(self.root, self.treeview)
 
         # Bind Treeview select event to enable Delete button
         self.treeview.bind("<<TreeviewSelect>>", self.on_treeview_select)
 
+        # Day shown in the Treeview (None for the user list) and its newest attendance rowid
+        self.shown_day = None
+        self.shown_rowid = 0
+
         self.load_today_attendance()
 
-        # Start refreshing the combobox and treeview
+        # Fill the combobox once; afterwards it only changes when the database does
+        self.attendance_dates = []
         self.refresh_combobox()
+        self.attendance_combobox.current(0)
 
-        # Schedule the combobox to refresh every 5 seconds (5000 ms)
-        self.auto_update_combobox()
+        # Watch the database for attendance written by recognition
+        self.data_version = self.db.data_version()
+        self.watch_database()
 
 
     def refresh_combobox(self):
-        """Refresh attendance dates in the combobox."""
-        self.attendance_dates = ["Select Day"] + self.get_attendance_dates()
-        self.attendance_combobox['values'] = self.attendance_dates
-        self.attendance_combobox.current(0)
+        """Update the attendance dates in the combobox if they changed, keeping the selection."""
+        dates = ["Select Day"] + self.get_attendance_dates()
+        if dates != self.attendance_dates:
+            self.attendance_dates = dates
+            self.attendance_combobox['values'] = dates
+
+    def watch_database(self):
+        """Refresh the combobox and the shown day only when another connection committed changes."""
+        version = self.db.data_version()
+        if version != self.data_version:
+            self.data_version = version
+            self.refresh_combobox()
+            self.append_new_attendance()
+            if self.reports_window is not None:
+                self.update_reports()
+        self.root.after(WATCH_INTERVAL_MS, self.watch_database)
+
+    def append_new_attendance(self):
+        """Add attendance marked since the shown day was loaded, without reloading the Treeview."""
+        if self.shown_day is None:
+            return
+        rows = self.db.attendance_after(self.shown_day, self.shown_rowid)
+        if not rows:
+            return
+        self.shown_rowid = rows[-1][0]
+        visible = self.table.add_rows(row[1:] for row in rows)
+        if visible is None:
+            self.show_table()  # The view is sorted, so new rows may land anywhere
+        else:
+            self.tree_loader.append(visible)
+            self.update_row_count()
 
-    def auto_update_combobox(self):
-        """Automatically update the combobox every few seconds."""
-        self.refresh_combobox()
-        self.root.after(5000, self.auto_update_combobox)  # Refresh every 5 seconds
 
+    def open_reports(self):
+        """Open the Reports window: per-user attendance rate, late arrivals and daily head-counts."""
+        if self.reports_window is not None:
+            self.reports_window.lift()
+            return
+        if self.analytics is None:
+            from analytics import AttendanceAnalytics
+            self.analytics = AttendanceAnalytics(self.db)
+
+        window = self.reports_window = tk.Toplevel(self.root)
+        window.title("Attendance Reports")
+        window.minsize(600, 400)
+        window.protocol("WM_DELETE_WINDOW", self.close_reports)
+
+        # Period and late arrival options
+        options = ttk.Frame(window)
+        options.pack(fill=tk.X, padx=10, pady=10)
+        ttk.Label(options, text="Period:").pack(side=tk.LEFT, padx=5)
+        self.report_period = ttk.Combobox(options, state="readonly",
+                                          values=["All time", "Last 7 days", "Last 30 days", "This month"])
+        self.report_period.current(0)
+        self.report_period.bind("<<ComboboxSelected>>", lambda event: self.update_reports())
+        self.report_period.pack(side=tk.LEFT, padx=5)
+        ttk.Label(options, text="Late after:").pack(side=tk.LEFT, padx=5)
+        self.late_after_entry = ttk.Entry(options, width=10)
+        self.late_after_entry.insert(0, "09:00:00")
+        self.late_after_entry.pack(side=tk.LEFT, padx=5)
+        ttk.Button(options, text="Update", command=self.update_reports).pack(side=tk.LEFT, padx=5)
+
+        # One tab per user summary, one per day
+        notebook = ttk.Notebook(window)
+        notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        user_columns = ("ID", "Name", "Days", "Rate %", "Late", "Avg Arrival")
+        self.user_report = self.create_report_table(notebook, "Users", user_columns)
+        self.day_report = self.create_report_table(notebook, "Daily Head-count", ("Day", "Present"))
+        self.update_reports()
+
+    def create_report_table(self, notebook, title, columns):
+        """A sortable Treeview tab; returns its (model, loader)."""
+        frame = ttk.Frame(notebook)
+        notebook.add(frame, text=title)
+        scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        treeview = ttk.Treeview(frame, columns=columns, show='headings', yscrollcommand=scrollbar.set)
+        treeview.pack(fill=tk.BOTH, expand=True)
+        scrollbar.config(command=treeview.yview)
+        model = TableModel()
+        loader = ChunkedTreeviewLoader(self.root, treeview)
+
+        def sort(column):
+            model.sort_by(column)
+            loader.load(model.view)
+
+        for i, column in enumerate(columns):
+            treeview.heading(column, text=column, command=lambda i=i: sort(i))
+        return model, loader
+
+    def report_range(self):
+        """(start, end) days of the selected report period; None means unbounded."""
+        today = datetime.now().date()
+        period = self.report_period.get()
+        if period == "Last 7 days":
+            return str(today - timedelta(days=6)), None
+        if period == "Last 30 days":
+            return str(today - timedelta(days=29)), None
+        if period == "This month":
+            return str(today.replace(day=1)), None
+        return None, None
+
+    def update_reports(self):
+        """Add new attendance to the analytics and redraw both report tables."""
+        late_after = self.late_after_entry.get().strip()
+        try:
+            datetime.strptime(late_after, '%H:%M:%S')
+        except ValueError:
+            messagebox.showwarning("Invalid Time", "Enter the late arrival time as HH:MM:SS.")
+            return
+        self.analytics.refresh()
+        start, end = self.report_range()
+        for (model, loader), rows in ((self.user_report, self.analytics.user_summary(start, end, late_after)),
+                                      (self.day_report, self.analytics.daily_headcount(start, end))):
+            model.set_rows(rows)
+            loader.load(model.view)
+
+    def close_reports(self):
+        for model, loader in (self.user_report, self.day_report):
+            loader.cancel()  # No more batches into the destroyed Treeviews
+        self.reports_window.destroy()
+        self.reports_window = None
 
     def check_id_exists(self, entered_id):
-        """Check if the entered ID already exists in names.csv."""
-        try:
-            with open('names.csv', newline='') as file:
-                reader = csv.reader(file)
-                next(reader, None)  # Skip header
-                for row in reader:
-                    existing_id = row[0].strip()  # Get the ID from each row
-                    if existing_id == entered_id:
-                        return True  # ID already exists
-        except FileNotFoundError:
-            messagebox.showerror("Error", "names.csv file not found")
-        return False  # ID does not exist
+        """Check if the entered ID already exists in the users table."""
+        return self.db.user_exists(entered_id)
 
     def capture_data(self):
         """Capture the data if the ID does not already exist."""
         entered_id = self.id_entry.get()
         entered_name = self.name_entry.get()
 
-        # Check if the ID already exists in names.csv
+        # Check if the ID already exists
         if self.check_id_exists(entered_id):
             messagebox.showwarning("Duplicate ID", f"ID {entered_id} already exists. Please use a different ID.")
         else:
-            # Create an instance of FaceCapture with the entered ID and Name
-            try:
+            def capture(task):
+                # Create an instance of FaceCapture with the entered ID and Name
                 import add_faces
-                fc = add_faces.FaceCapture(user_id=entered_id, user_name=entered_name)
-                fc.capture_faces()  # Start face capturing process
-
-                # After the face capture completes, show a confirmation dialog
-                keep_data = messagebox.askyesno("Keep Captured Data",
-                                                "Face capture completed successfully! Would you like to keep the captured faces for training?")
-
-                if not keep_data:
-                    # If the user selects 'No', delete the directory and remove the entry from names.csv
-                    face_dir = f"Faces/{entered_id}_{entered_name}"
-                    shutil.rmtree(face_dir)  # Delete the face directory
-
-                    self.remove_record_from_csv('names.csv', entered_id, entered_name)  # Remove the ID/Name from CSV
-                    messagebox.showinfo("Data Deleted", "ID, name, and captured faces have been deleted.")
-                else:
-                    import train_model
-                    try:
-                        trainer = train_model.Trainer()
-                        trainer.train_faces()
-                    except Exception as e:
-                        messagebox.showwarning("Unsuccessful", f"Model doesn't train du to: {e}")
-                    messagebox.showinfo("Data Saved", "Captured data has been saved for model training.")
-            except Exception as e:
-                messagebox.showerror("Error", f"Face capture failed: {e}")
+                fc = add_faces.FaceCapture(user_id=entered_id, user_name=entered_name, database=self.db,
+                                           notifier=task.notify, stop_event=task.stop_event, preview=task.preview,
+                                           progress=lambda count, total: task.progress(
+                                               count, total, f"Captured {count}/{total} images"))
+                count = fc.capture_faces()  # Start face capturing process
+                return count, fc.user_added
+
+            self.start_task("Face capture", capture,
+                            on_done=lambda task, result: self.capture_finished(task, entered_id, entered_name,
+                                                                               *result),
+                            on_error=lambda task, e: messagebox.showerror("Error", f"Face capture failed: {e}"))
 
         # Clear entry fields after successful capture and training
         self.id_entry.delete(0, tk.END)
         self.name_entry.delete(0, tk.END)
 
+    def capture_finished(self, task, entered_id, entered_name, count, user_added):
+        """Ask whether to keep the captured faces, then train on them in the background.
+
+        count is what FaceCapture.capture_faces returned: None when it failed.
+        """
+        face_dir = f"Faces/{entered_id}_{entered_name}"
+        if task.cancelled or not count:
+            # A cancelled or failed capture is incomplete, so it is discarded; the capture has
+            # reported why. A user the capture didn't add (the ID was taken meanwhile) is left alone
+            if user_added:
+                shutil.rmtree(face_dir, ignore_errors=True)
+                self.db.delete_user(entered_id)
+            if not task.cancelled:
+                self.status_label.config(text="Face capture failed, the ID and name were not saved")
+            return
+
+        # After the face capture completes, show a confirmation dialog
+        keep_data = messagebox.askyesno("Keep Captured Data",
+                                        f"Face capture completed with {count} images! Would you like to keep "
+                                        f"the captured faces for training?")
+
+        if not keep_data:
+            # If the user selects 'No', delete the directory and remove the user
+            shutil.rmtree(face_dir, ignore_errors=True)  # Delete the face directory
+
+            self.db.delete_user(entered_id)  # Remove the ID/Name
+            messagebox.showinfo("Data Deleted", "ID, name, and captured faces have been deleted.")
+        else:
+            def train(task):
+                import train_model
+                trainer = train_model.Trainer(notifier=task.notify, progress=task.progress, stop_event=task.stop_event)
+                trainer.train_faces(incremental=True)  # Only the new user's images are trained
+
+            self.start_task("Training", train,
+                            on_done=lambda task, result: messagebox.showinfo(
+                                "Data Saved", "Captured data has been saved for model training."),
+                            on_error=lambda task, e: messagebox.showwarning(
+                                "Unsuccessful", f"Model doesn't train du to: {e}"))
+
+    def start_task(self, name, work, on_done=None, on_error=None):
+        """Run work(task) in the background unless another job is running; returns the task or None."""
+        if self.executor.busy:
+            messagebox.showwarning("Busy", "Please wait for the running job to finish or cancel it.")
+            return None
+
+        def finished(callback):
+            def handler(task, result):
+                self.task_finished(task)
+                if callback:
+                    callback(task, result)
+            return handler
+
+        self.mark_button.config(state=tk.DISABLED)
+        self.capture_button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
+        self.progress_bar.config(value=0, maximum=1)
+        self.status_label.config(text=f"{name}...")
+        on_error = on_error or (lambda task, e: messagebox.showerror("Error", f"{name} failed: {e}"))
+        return self.executor.submit(name, work, on_progress=self.show_task_progress,
+                                    on_done=finished(on_done), on_error=finished(on_error))
+
+    def task_finished(self, task):
+        self.close_preview()
+        self.status_label.config(text=f"{task.name} cancelled" if task.cancelled else f"{task.name} finished")
+        self.cancel_button.config(state=tk.DISABLED)
+        self.mark_button.config(state=tk.NORMAL)
+        self.check_fields()
+
+    def show_task_progress(self, task, done, total, message):
+        if total:
+            self.progress_bar.config(value=done, maximum=total)
+        self.status_label.config(text=f"{task.name}: {message}" if message else f"{task.name}: {done}")
+
+    def show_task_message(self, task, kind, title, message):
+        """Show a message sent by a background job; information goes to the status bar."""
+        if kind == "showinfo":
+            self.status_label.config(text=f"{title}: {message}")
+        else:
+            getattr(messagebox, kind)(title, message)
+
+    def show_task_frame(self, task, frame):
+        """Show a camera frame of a background job; closing the window or pressing q cancels the job."""
+        if self.preview_window is None:
+            self.preview_window = tk.Toplevel(self.root)
+            self.preview_window.protocol("WM_DELETE_WINDOW", self.cancel_task)
+            self.preview_window.bind("q", lambda event: self.cancel_task())
+            self.preview_label = ttk.Label(self.preview_window)
+            self.preview_label.pack()
+        self.preview_window.title(task.name)
+        photo = ImageTk.PhotoImage(Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
+        self.preview_label.config(image=photo)
+        self.preview_label.image = photo  # Tk keeps no reference of its own
+
+    def close_preview(self):
+        if self.preview_window is not None:
+            self.preview_window.destroy()
+            self.preview_window = None
+
+    def cancel_task(self):
+        """Ask the running job to stop."""
+        self.executor.cancel_all()
+        self.cancel_button.config(state=tk.DISABLED)
+        self.status_label.config(text="Cancelling...")
+
     def validate_id(self, new_value):
         """Allow only digits for the ID field."""
         if new_value.isdigit() or new_value == "":
@@ -204,61 +457,75 @@ class SmartAttendanceSystem:
             self.capture_button.config(state=tk.DISABLED)
 
     def get_attendance_dates(self):
-        """Fetch CSV filenames in 'attendance' directory and return dates (yyyy-mm-dd)."""
-        if not os.path.exists('attendance'):
-            os.makedirs('attendance')
-        return [filename.replace('.csv', '') for filename in os.listdir('attendance') if filename.endswith('.csv')]
+        """Return the days (yyyy-mm-dd) that have attendance, newest first."""
+        return self.db.attendance_days()
 
     def load_attendance_data(self, event):
-        """Load attendance data from the selected CSV file into the Treeview."""
+        """Load attendance data of the selected day into the Treeview."""
         selected_date = self.attendance_combobox.get()
         if selected_date != "Select Day":
-            file_path = os.path.join('attendance', f'{selected_date}.csv')
-            self.load_csv_data(file_path)
+            self.load_day(selected_date)
 
             # Disable Delete button since we are displaying attendance data
             self.delete_button.config(state=tk.DISABLED)
 
     def show_all_data(self):
-        """Display data from names.csv into Treeview, skipping the first row."""
+        """Display all users in the Treeview."""
         # Reset the combobox to default value "Select Day"
         self.attendance_combobox.set("Select Day")
-        self.load_csv_data('names.csv', skip_first_row=True)
+        self.shown_day = None
+        self.load_rows(self.db.users())
 
     def load_today_attendance(self):
-        """Check for today's attendance file and load it into the Treeview."""
+        """Load today's attendance into the Treeview."""
         today_date = datetime.now().strftime('%Y-%m-%d')  # Format today's date as 'yyyy-mm-dd'
-        file_path = os.path.join('attendance', f'{today_date}.csv')  # Path to today's attendance file
-
-        if os.path.isfile(file_path):
-            self.load_csv_data(file_path)  # Load data into the Treeview
-
-    def load_csv_data(self, filepath, skip_first_row=False):
-        """Load data from a given CSV file and display it in the Treeview."""
-        try:
-            with open(filepath, newline='') as file:
-                reader = csv.reader(file)
-                self.clear_treeview()
-
-                # Skip the first row if specified
-                if skip_first_row:
-                    next(reader, None)  # Skip the first row (header)
-
-                for row in reader:
-                    self.treeview.insert("", "end", values=row)
-        except FileNotFoundError:
-            messagebox.showerror("Error", f"File {filepath} not found")
+        self.load_day(today_date)
+
+    def load_day(self, day):
+        """Show a day's attendance and remember it so new marks can be appended."""
+        rows = self.db.attendance_after(day)  # One query, so no mark falls between the rows and the rowid
+        self.shown_day = day
+        self.shown_rowid = rows[-1][0] if rows else 0
+        self.load_rows(row[1:] for row in rows)
+
+    def load_rows(self, rows):
+        """Display the given rows in the Treeview."""
+        self.table.set_rows(rows)
+        self.show_table()
+
+    def show_table(self):
+        """Insert the model's filtered and sorted rows into the Treeview in batches."""
+        self.tree_loader.load(self.table.view)
+        self.update_row_count()
+
+    def update_row_count(self):
+        self.row_count_label.config(text=f"{len(self.table.view)} of {len(self.table.rows)} rows")
+
+    def sort_treeview(self, column):
+        """Sort the displayed rows by a column index."""
+        self.table.sort_by(column)
+        self.show_table()
+
+    def on_filter_changed(self, *args):
+        """Filter the displayed rows shortly after typing stops."""
+        if self.filter_job is not None:
+            self.root.after_cancel(self.filter_job)
+        self.filter_job = self.root.after(200, self.apply_filter)
+
+    def apply_filter(self):
+        self.filter_job = None
+        self.table.set_filter(self.filter_var.get())
+        self.show_table()
 
     def clear_treeview(self):
         """Clear all items in the Treeview."""
-        for row in self.treeview.get_children():
-            self.treeview.delete(row)
+        self.tree_loader.clear()
 
     def on_treeview_select(self, event):
-        """Enable the Delete button when an item from names.csv is selected."""
+        """Enable the Delete button when a user is selected."""
         selected_item = self.treeview.selection()
         if selected_item:
-            # Check if the data is from names.csv
+            # Check if the data is the user list
             current_combobox_value = self.attendance_combobox.get()
             if current_combobox_value == "Select Day":
                 self.delete_button.config(state=tk.NORMAL)
@@ -266,7 +533,7 @@ class SmartAttendanceSystem:
             self.delete_button.config(state=tk.DISABLED)
 
     def delete_record(self):
-        """Delete the selected record from names.csv and remove its corresponding directory."""
+        """Delete the selected user and remove its corresponding directory."""
         selected_item = self.treeview.selection()
         if not selected_item:
             messagebox.showwarning("Select Record", "Please select a record to delete.")
@@ -281,47 +548,30 @@ class SmartAttendanceSystem:
         combined_name = f"{id_to_delete}_{name_to_delete}"
         directory_path = os.path.join("Faces", combined_name)
 
+        if self.executor.busy:
+            messagebox.showwarning("Busy", "Please wait for the running job to finish or cancel it.")
+            return
+
         # Confirm deletion
         if messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete {id_to_delete} {name_to_delete}?"):
-            # Remove record from names.csv
-            self.remove_record_from_csv('names.csv', id_to_delete, name_to_delete)
+            # Remove the user
+            self.db.delete_user(id_to_delete)
 
             # Remove directory
             self.remove_directory(directory_path)
 
-            # Refresh the Treeview to show the updated data
-            self.show_all_data()  # Reload the data from names.csv
-
-    def remove_record_from_csv(self, filepath, id_to_delete, name_to_delete):
-        """Remove a record from the specified CSV file."""
-        updated_rows = []
-
-        # Make sure both ID and Name are treated as strings for comparison
-        id_to_delete = str(id_to_delete).strip()
-        name_to_delete = str(name_to_delete).strip()
-
-        with open(filepath, newline='') as file:
-            reader = csv.reader(file)
-
-            # Read and keep the header row
-            header = next(reader)
-            updated_rows.append(header)  # Keep the header in the updated rows
-
-            for row in reader:
-                # Strip any extra spaces from the row data
-                id_value = row[0].strip()
-                name_value = row[1].strip()
+            # Rebuild the model without the deleted user's faces
+            def rebuild(task):
+                import train_model
+                trainer = train_model.Trainer(notifier=task.notify, progress=task.progress, stop_event=task.stop_event)
+                trainer.remove_user(id_to_delete)
 
-                # Check if the current row matches the ID and Name to delete
-                if id_value == id_to_delete and name_value == name_to_delete:
-                    continue  # Skip this row (effectively deleting it)
+            self.start_task("Model update", rebuild,
+                            on_error=lambda task, e: messagebox.showwarning(
+                                "Unsuccessful", f"Model doesn't update due to: {e}"))
 
-                updated_rows.append(row)  # Keep rows that do not match
-
-        # After reading all rows, write the updated rows back to the file
-        with open(filepath, 'w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerows(updated_rows)  # Write the remaining rows
+            # Refresh the Treeview to show the updated data
+            self.show_all_data()  # Reload the users
 
     def remove_directory(self, directory_path):
         """Remove the specified directory and its contents if it exists."""
@@ -333,71 +583,70 @@ class SmartAttendanceSystem:
                 messagebox.showerror("Error", f"Failed to delete directory {directory_path}. {e}")
 
     def mark_attendance(self):
-        import recognize_faces
-        try:
-            recognizer = recognize_faces.FaceRecognizer()
-            recognizer.recognize_faces()
-        except Exception as e:
-            messagebox.showwarning("Warning", f"Failed to start face recognition: {e}")
+        def recognize(task):
+            import recognize_faces
+            from recognition_client import RecognitionClient
+            # Use the resident recognition service when one is running, it has the model loaded already
+            recognizer = recognize_faces.FaceRecognizer(stop_event=task.stop_event, notifier=task.notify,
+                                                        progress=task.progress, preview=task.preview,
+                                                        service=RecognitionClient.connect())
+            return recognizer.recognize_faces()
+
+        def show_report(task, report):
+            self.status_label.config(text=f"{self.status_label.cget('text')}: {report}")
+
+        self.start_task("Face recognition", recognize, on_done=show_report,
+                        on_error=lambda task, e: messagebox.showwarning(
+                            "Warning", f"Failed to start face recognition: {e}"))
+
+    def report_title(self):
+        """Title and column headers of what the Treeview shows."""
+        if self.shown_day is None:
+            return "Users", ("ID", "Name")
+        return f"Attendance {self.shown_day}", ("ID", "Name", "Time")
 
     def print_data(self):
-        """Print the data from the Treeview."""
+        """Print the displayed rows as a paginated PDF through the platform's print backend."""
         try:
-            # Get the data from the Treeview
-            records = []
-            for row in self.treeview.get_children():
-                records.append(self.treeview.item(row)['values'])
+            # Get the displayed rows from the model, including rows not inserted into the Treeview yet
+            records = self.table.view
 
             if not records:
                 messagebox.showwarning("No Data", "There are no records to print.")
                 return
 
-            # Create a temporary image to draw the Treeview data
-            temp_image_path = tempfile.mktemp(suffix=".png")
-            self.create_image_from_records(records, temp_image_path)
+            title, headers = self.report_title()
+            pdf_path = os.path.join(tempfile.mkdtemp(prefix="attendance_print_"), "report.pdf")
+            export.export_pdf(records, pdf_path, headers, title=title)
 
-            # Print the image using the default printer
-            win32api.ShellExecute(0, "print", temp_image_path, None, ".", 0)
+            # lpr, the Windows shell, or a spool directory (see export.default_printer)
+            self.status_label.config(text=export.default_printer().print_file(pdf_path))
 
         except Exception as e:
             messagebox.showerror("Error", f"An error occurred while printing: {e}")
 
-    def create_image_from_records(self, records, image_path):
-        """Create an image from the records and save it to the specified path."""
-        # Create an image with white background
-        img_width = 400
-        img_height = 20 + len(records) * 30 + 30  # Adjust height based on number of records
-        image = Image.new("RGB", (img_width, img_height), "white")
-        draw = ImageDraw.Draw(image)
-
-        # Load a font
+    def export_data(self):
+        """Save the displayed rows as a PDF, paged PNG images or CSV."""
+        records = self.table.view
+        if not records:
+            messagebox.showwarning("No Data", "There are no records to export.")
+            return
+        path = filedialog.asksaveasfilename(title="Export", defaultextension=".pdf",
+                                            filetypes=[("PDF", "*.pdf"), ("PNG pages", "*.png"), ("CSV", "*.csv")])
+        if not path:
+            return
         try:
-            font = ImageFont.truetype("arial.ttf", 16)
-        except IOError:
-            font = ImageFont.load_default()
-
-        # Draw header
-        headers = ["ID", "Name", "Time"]
-        header_y = 10
-        for i, header in enumerate(headers):
-            draw.text((10 + i * 130, header_y), header, fill="black", font=font)
-
-        # Draw records
-        record_y = header_y + 30
-        for record in records:
-            for i, value in enumerate(record):
-                draw.text((10 + i * 130, record_y), str(value), fill="black", font=font)
-            record_y += 30
-
-        # Optionally, add a little extra padding at the bottom
-        draw.text((10, record_y), " ", fill="white", font=font)  # Adds a blank line at the end
-
-        # Save the image
-        image.save(image_path)
+            title, headers = self.report_title()
+            paths = export.export(records, path, headers, title=title)
+            self.status_label.config(text=f"Exported {len(records)} rows to {len(paths)} file(s), e.g. {paths[0]}")
+        except Exception as e:
+            messagebox.showerror("Error", f"An error occurred while exporting: {e}")
 
     def exit_application(self):
         """Exit the application with confirmation."""
         if messagebox.askyesno("Confirm Exit", "Are you sure you want to exit?"):
+            self.executor.shutdown()
+            self.db.close()
             self.root.quit()
 
 
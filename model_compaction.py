@@ -0,0 +1,111 @@
+import time
+import numpy as np
+from lbp_engine import LBPHRecognizer, from_opencv
+
+
+def pairwise_chi_square(histograms):
+    """Symmetric (n, n) chi-square (HISTCMP_CHISQR_ALT) distances between histogram rows."""
+    histograms = np.asarray(histograms, dtype=np.float32)
+    n = len(histograms)
+    dists = np.zeros((n, n), dtype=np.float64)
+    for i in range(n - 1):
+        a, rest = histograms[i], histograms[i + 1:]
+        total = rest + a
+        diff = rest - a
+        # Bins empty in both histograms contribute nothing
+        terms = np.divide(diff * diff, total, out=np.zeros_like(total), where=total > 0)
+        dists[i, i + 1:] = dists[i + 1:, i] = 2 * terms.sum(axis=1, dtype=np.float64)
+    return dists
+
+
+def medoids(dists, k, iterations=20):
+    """Indices of k medoids of a distance matrix (farthest-point start, then alternating updates)."""
+    n = len(dists)
+    if n <= k:
+        return np.arange(n)
+    chosen = [int(np.argmin(dists.sum(axis=1)))]
+    while len(chosen) < k:
+        chosen.append(int(np.argmax(dists[:, chosen].min(axis=1))))
+    chosen = np.array(chosen)
+    for _ in range(iterations):
+        assignment = np.argmin(dists[:, chosen], axis=1)
+        updated = chosen.copy()
+        for cluster in range(k):
+            members = np.flatnonzero(assignment == cluster)
+            if len(members):
+                updated[cluster] = members[np.argmin(dists[np.ix_(members, members)].sum(axis=1))]
+        if np.array_equal(updated, chosen):
+            break
+        chosen = updated
+    return np.sort(chosen)
+
+
+def compact(recognizer, k):
+    """A new LBPHRecognizer keeping at most k medoid histograms per identity.
+
+    OpenCV models are accepted too; the result is always a numpy engine model, since
+    cv2.face can't be loaded with chosen histograms.
+    """
+    if not isinstance(recognizer, LBPHRecognizer):
+        recognizer = from_opencv(recognizer)
+    histograms, labels = np.asarray(recognizer.histograms), np.asarray(recognizer.labels)
+    keep = []
+    for start, end in zip(recognizer.label_starts, list(recognizer.label_starts[1:]) + [len(labels)]):
+        rows = np.arange(start, end)
+        keep.extend(rows[medoids(pairwise_chi_square(histograms[rows]), k)])
+
+    compacted = LBPHRecognizer(recognizer.radius, recognizer.neighbors, recognizer.grid_x, recognizer.grid_y,
+                               recognizer.threshold)
+    if keep:
+        compacted.set_model(histograms[keep], labels[keep])
+    return compacted
+
+
+def split_holdout(ids, holdout=0.2):
+    """Boolean mask of held-out rows: every n-th image of each identity, at least one kept for training."""
+    ids = np.asarray(ids)
+    mask = np.zeros(len(ids), dtype=bool)
+    step = max(2, int(round(1 / holdout))) if holdout > 0 else 0
+    if not step:
+        return mask
+    for label in np.unique(ids):
+        rows = np.flatnonzero(ids == label)
+        mask[rows[step - 1::step]] = True
+    return mask
+
+
+def evaluate(faces, ids, ks, holdout=0.2):
+    """Accuracy and predict latency of the full model and of each compacted size on held-out faces.
+
+    Returns one dict per model: k (None for the full model), histograms, top1_accuracy,
+    predict_ms (per face, batched) and train_s.
+    """
+    ids = np.asarray(ids)
+    test = split_holdout(ids, holdout)
+    train_faces = [face for face, held in zip(faces, test) if not held]
+    test_faces = [face for face, held in zip(faces, test) if held]
+    test_ids = ids[test]
+    if not test_faces:
+        raise ValueError("No held-out images, capture more images per user or raise the hold-out share")
+
+    start = time.perf_counter()
+    full = LBPHRecognizer()
+    full.train(train_faces, ids[~test])
+    train_time = time.perf_counter() - start
+
+    results = []
+    for k in [None] + list(ks):
+        model = full
+        compact_time = 0.0
+        if k is not None:
+            start = time.perf_counter()
+            model = compact(full, k)
+            compact_time = time.perf_counter() - start
+        start = time.perf_counter()
+        labels, _ = model.predict_batch(test_faces)
+        elapsed = time.perf_counter() - start
+        results.append({"k": k, "histograms": len(model.labels),
+                        "top1_accuracy": float(np.mean(labels[:, 0] == test_ids)),
+                        "predict_ms": 1000.0 * elapsed / len(test_faces),
+                        "train_s": train_time + compact_time})
+    return results
@@ -0,0 +1,77 @@
+import os
+import threading
+from storage import DATABASE_FILE, AttendanceDatabase
+from lbp_engine import MODEL_FILES, create_recognizer, current_model_file, model_version
+
+
+class ModelWatcher:
+    """Polls a model's version marker and loads new versions on a background thread.
+
+    The frame loop calls take() between frames and swaps in what it returns, so loading a
+    model never stalls the camera. Names are read from the database with every new model,
+    since a new version usually means newly enrolled users. A version without a model file
+    (retracted, or deleted by hand) is delivered as recognizer None: the model is dropped.
+    """
+
+    def __init__(self, engine="opencv", model_file=None, database=DATABASE_FILE, interval=2.0, version=None,
+                 notify=None):
+        self.engine = engine
+        self.model_file = model_file or MODEL_FILES[engine]
+        self.database = database
+        self.interval = interval
+        # Version of the model in use; pass the version read before loading it
+        self.version = model_version(self.model_file) if version is None else version
+        # notify(kind, title, message) reports models that failed to load
+        self.notify = notify
+        self.pending = None
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="model-watcher", daemon=True)
+        self.thread.start()
+        return self
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.check()
+
+    def check(self):
+        """Load the published model if its version changed; returns True when one was loaded."""
+        version = model_version(self.model_file)
+        if version == self.version:
+            return False
+        try:
+            path = current_model_file(self.model_file)
+            recognizer = None
+            if path is not None and os.path.isfile(path):
+                recognizer = create_recognizer(self.engine)
+                recognizer.read(path)
+            db = AttendanceDatabase(self.database)
+            try:
+                names = db.names()
+            finally:
+                db.close()
+        except Exception as e:
+            if self.notify:
+                self.notify("showerror", "Error", f"Error loading model version {version}: {e}")
+            return False
+        finally:
+            self.version = version  # A model that failed to load is not retried until the next version
+        with self.lock:
+            self.pending = (version, recognizer, names)
+        return True
+
+    def take(self):
+        """The newest loaded (version, recognizer or None, names) once, or None if nothing new was loaded."""
+        if self.pending is None:
+            return None
+        with self.lock:
+            update, self.pending = self.pending, None
+        return update
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
@@ -0,0 +1,166 @@
+import time
+import queue
+import datetime
+import threading
+import multiprocessing
+from attendance_store import AttendanceStore
+from storage import DATABASE_FILE
+from lbp_engine import load_model
+
+STATS_INTERVAL = 5.0  # Seconds between per-camera statistics messages
+
+
+class EventAttendance:
+    """Stands in for AttendanceStore inside a camera worker: marks become events for the shared sink.
+
+    Only IDs this camera already reported today are filtered here; de-duplication across
+    cameras happens in AttendanceSink.
+    """
+
+    def __init__(self, camera, events):
+        self.camera = camera
+        self.events = events
+        self.day = None
+        self.sent = set()
+
+    def is_marked(self, user_id):
+        self.roll_over()
+        return AttendanceStore.key(user_id) in self.sent
+
+    def mark(self, user_id, name):
+        if self.is_marked(user_id):
+            return False
+        self.sent.add(AttendanceStore.key(user_id))
+        self.events.put(("attendance", self.camera, int(user_id), name, time.time()))
+        return True
+
+    def roll_over(self):
+        today = datetime.date.today()
+        if today != self.day:
+            self.day = today
+            self.sent = set()
+
+    def close(self):
+        pass
+
+
+class AttendanceSink:
+    """Single attendance writer fed by every camera worker, with per-camera counters."""
+
+    def __init__(self, database=DATABASE_FILE):
+        self.store = AttendanceStore(database)
+        self.cameras = {}
+
+    def camera_stats(self, camera):
+        return self.cameras.setdefault(camera, {"frames": 0, "fps": 0.0, "events": 0, "marked": 0,
+                                                "duplicates": 0, "error": None, "done": False})
+
+    def handle(self, event):
+        kind, camera = event[0], event[1]
+        stats = self.camera_stats(camera)
+        if kind == "attendance":
+            _, _, user_id, name, _ = event
+            stats["events"] += 1
+            if self.store.mark(user_id, name):
+                stats["marked"] += 1
+                print(f"[{camera}] Attendance marked for {name} (ID: {user_id}).")
+            else:
+                stats["duplicates"] += 1  # Already marked today, possibly by another camera
+        elif kind == "stats":
+            _, _, frames, elapsed = event
+            stats["frames"] = frames
+            stats["fps"] = frames / elapsed if elapsed else 0.0
+        elif kind == "error":
+            stats["error"] = event[2]
+            print(f"[{camera}] Failed: {event[2]}")
+        elif kind == "done":
+            stats["done"] = True
+
+    def report(self):
+        lines = []
+        for camera, stats in self.cameras.items():
+            line = (f"[{camera}] {stats['fps']:.1f} FPS over {stats['frames']} frames, {stats['events']} events, "
+                    f"{stats['marked']} marked, {stats['duplicates']} duplicates")
+            if stats["error"]:
+                line += f", error: {stats['error']}"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def close(self):
+        self.store.close()
+
+
+def camera_worker(camera, source, options, events, stop_event, recognizer=None):
+    """Run one FaceRecognizer in its own process and forward events to the sink."""
+    try:
+        import recognize_faces
+        recognizer = recognize_faces.FaceRecognizer(camera_index=source, headless=True, recognizer=recognizer,
+                                                    attendance=EventAttendance(camera, events),
+                                                    stop_event=stop_event, **options)
+        start = time.perf_counter()
+        finished = threading.Event()
+
+        def send_stats():
+            # Periodic frame counts so the parent can report FPS while the camera runs
+            while not finished.wait(STATS_INTERVAL):
+                events.put(("stats", camera, recognizer.scheduler.frames, time.perf_counter() - start))
+
+        threading.Thread(target=send_stats, daemon=True).start()
+        try:
+            recognizer.recognize_faces()
+        finally:
+            finished.set()
+            events.put(("stats", camera, recognizer.scheduler.frames, time.perf_counter() - start))
+    except Exception as e:
+        events.put(("error", camera, str(e)))
+    finally:
+        events.put(("done", camera))
+
+
+def run(sources, engine="opencv", database=DATABASE_FILE, **options):
+    """Recognize on every source in its own process until all sources end or Ctrl+C is pressed.
+
+    Where processes are forked, the model is loaded once here and shared copy-on-write
+    with every worker; with the spawn start method each worker loads its own copy.
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+        shared_model = load_model(engine)
+    else:
+        context = multiprocessing.get_context("spawn")
+        shared_model = None
+
+    events = context.Queue()
+    stop_event = context.Event()
+    options = dict(options, engine=engine, database=database)
+    workers = []
+    for index, source in enumerate(sources):
+        camera = f"cam{index}:{source}"
+        process = context.Process(target=camera_worker, name=camera, daemon=True,
+                                  args=(camera, source, options, events, stop_event, shared_model))
+        process.start()
+        workers.append(process)
+
+    sink = AttendanceSink(database)
+    try:
+        while True:
+            try:
+                sink.handle(events.get(timeout=0.5))
+            except queue.Empty:
+                if not any(process.is_alive() for process in workers):
+                    break
+    except KeyboardInterrupt:
+        stop_event.set()
+    finally:
+        stop_event.set()
+        for process in workers:
+            process.join(timeout=5)
+        # Drain what the workers sent while stopping
+        while True:
+            try:
+                sink.handle(events.get_nowait())
+            except queue.Empty:
+                break
+        sink.close()
+    print(sink.report())
+    return sink.cameras
@@ -0,0 +1,12 @@
+from tkinter import messagebox
+
+
+def show_message(kind, title, message, notifier=None, headless=False):
+    """Deliver a message: to notifier(kind, title, message) if given, printed in headless mode,
+    otherwise as a messagebox (kind is a messagebox function name such as "showinfo")."""
+    if notifier:
+        notifier(kind, title, message)
+    elif headless:
+        print(f"{title}: {message}")
+    else:
+        getattr(messagebox, kind)(title, message)
@@ -0,0 +1,116 @@
+import json
+import socket
+import struct
+import numpy as np
+
+HOST = "127.0.0.1"
+PORT = 8765
+
+# Every message is two big-endian lengths, a JSON header and a binary payload of raw image bytes
+PREFIX = struct.Struct(">II")
+
+
+def encode_message(header, payload=b""):
+    body = json.dumps(header).encode()
+    return PREFIX.pack(len(body), len(payload)) + body + payload
+
+
+def pack_images(images):
+    """Image descriptions for a header and the concatenated pixel bytes."""
+    images = [np.ascontiguousarray(image, dtype=np.uint8) for image in images]
+    return [list(image.shape) for image in images], b"".join(image.tobytes() for image in images)
+
+
+def unpack_images(shapes, payload):
+    images, offset = [], 0
+    for shape in shapes:
+        size = int(np.prod(shape))
+        images.append(np.frombuffer(payload, dtype=np.uint8, count=size, offset=offset).reshape(shape))
+        offset += size
+    return images
+
+
+class ServiceError(Exception):
+    """The recognition service could not be reached or rejected a request."""
+
+
+class RecognitionClient:
+    """Blocking client for the resident recognition service (see recognition_service).
+
+    One connection per client; the service keeps liveness state per connection and
+    track ID, so pass the same track IDs frame after frame.
+    """
+
+    def __init__(self, host=HOST, port=PORT, timeout=5.0):
+        try:
+            self.socket = socket.create_connection((host, port), timeout=timeout)
+        except OSError as e:
+            raise ServiceError(f"Recognition service not reachable at {host}:{port}: {e}") from e
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    @classmethod
+    def connect(cls, host=HOST, port=PORT, timeout=1.0):
+        """A client if the service is running, otherwise None."""
+        try:
+            return cls(host, port, timeout)
+        except ServiceError:
+            return None
+
+    def receive_exactly(self, size):
+        data = bytearray()
+        while len(data) < size:
+            chunk = self.socket.recv(size - len(data))
+            if not chunk:
+                raise ServiceError("Recognition service closed the connection")
+            data.extend(chunk)
+        return bytes(data)
+
+    def request(self, header, payload=b""):
+        try:
+            self.socket.sendall(encode_message(header, payload))
+            header_size, payload_size = PREFIX.unpack(self.receive_exactly(PREFIX.size))
+            response = json.loads(self.receive_exactly(header_size))
+            payload = self.receive_exactly(payload_size)
+        except OSError as e:
+            raise ServiceError(f"Recognition service request failed: {e}") from e
+        if "error" in response:
+            raise ServiceError(response["error"])
+        return response, payload
+
+    @staticmethod
+    def results(response, payload):
+        """Attach the landmark arrays, sent as float32 in the payload, to their results."""
+        offset = 0
+        for result in response["results"]:
+            if result["landmarks"] is not None:
+                count = 2 * result["landmarks"]
+                result["landmarks"] = np.frombuffer(payload, dtype=np.float32, count=count,
+                                                    offset=offset).reshape(-1, 2)
+                offset += 4 * count
+        return response["results"]
+
+    def recognize(self, faces, track_ids, threshold=50, labels=None):
+        """Recognize BGR face crops; returns one dict per face with id, name, confidence, live and
+        landmarks ((n, 2) normalized to the crop, or None). Liveness is only checked below threshold.
+
+        labels optionally gives a user ID per face already known to the caller, or None: labeled
+        faces are not predicted, only checked for liveness as that user (with confidence 0).
+        """
+        shapes, payload = pack_images(faces)
+        header = {"op": "recognize", "shapes": shapes, "tracks": [int(t) for t in track_ids], "threshold": threshold}
+        if labels is not None:
+            header["labels"] = [None if label is None else int(label) for label in labels]
+        return self.results(*self.request(header, payload))
+
+    def recognize_frame(self, frame, threshold=50):
+        """Detect, track and recognize the faces of a BGR frame; results also carry the face box."""
+        shapes, payload = pack_images([frame])
+        return self.results(*self.request({"op": "recognize_frame", "shapes": shapes, "threshold": threshold},
+                                          payload))
+
+    def health(self):
+        """Service status and throughput metrics."""
+        return self.request({"op": "health"})[0]
+
+    def close(self):
+        self.socket.close()
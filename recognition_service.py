@@ -0,0 +1,281 @@
+import json
+import time
+import asyncio
+import functools
+import concurrent.futures
+import cv2
+import numpy as np
+import mediapipe as mp
+from storage import DATABASE_FILE, AttendanceDatabase
+from face_tracker import DetectionScheduler
+from liveness import LivenessTracker, landmarks_to_array
+from lbp_engine import MODEL_FILES, load_model, model_version
+from model_reload import ModelWatcher
+from instrumentation import StageTimer
+from notifications import show_message
+from recognition_client import HOST, PORT, PREFIX, encode_message, unpack_images
+
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024  # Larger messages close the connection
+
+
+async def read_message(reader):
+    header_size, payload_size = PREFIX.unpack(await reader.readexactly(PREFIX.size))
+    if header_size + payload_size > MAX_MESSAGE_BYTES:
+        raise ValueError(f"Message of {header_size + payload_size} bytes is too large")
+    header = json.loads(await reader.readexactly(header_size))
+    return header, await reader.readexactly(payload_size)
+
+
+class ClientSession:
+    """Per connection state: liveness history per track, and a tracker for whole frames."""
+
+    def __init__(self, face_cascade, detect_interval, detect_scale):
+        self.liveness = LivenessTracker()
+        self.scheduler = DetectionScheduler(face_cascade, detect_interval=detect_interval, detect_scale=detect_scale)
+
+
+class RecognitionService:
+    """Resident recognizer: loads the model, names, cascade and face mesh once and serves kiosks over TCP.
+
+    Face crops from every connected client are queued and scored together. The batcher
+    takes the first request, then waits up to max_wait_ms for the other clients (until
+    max_batch faces or one request per client) and runs a single predict call for all of
+    them. The model, cascade and face mesh are only used from one model thread.
+    """
+
+    def __init__(self, engine="opencv", host=HOST, port=PORT, max_batch=64, max_wait_ms=5.0, threshold=50,
+                 match_margin=0.0, detect_interval=5, detect_scale=0.5, database=DATABASE_FILE, recognizer=None,
+                 reload_interval=2.0):
+        version = model_version(MODEL_FILES[engine])
+        if recognizer is None:
+            recognizer = load_model(engine)
+        self.recognizer = recognizer
+        self.engine = engine
+        self.host = host
+        self.port = port
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        # Default for requests without a threshold of their own
+        self.threshold = threshold
+        self.match_margin = match_margin
+        self.detect_interval = detect_interval
+        self.detect_scale = detect_scale
+
+        db = AttendanceDatabase(database)
+        try:
+            self.names = db.names()
+        finally:
+            db.close()
+
+        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        self.face_mesh = mp.solutions.face_mesh.FaceMesh(max_num_faces=1)
+        self.model_thread = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="model")
+        # Newly published models are loaded in the background and swapped in between batches.
+        # Reloads and load errors are both reported through notify, printed on the console
+        self.notify = functools.partial(show_message, headless=True)
+        self.model_version = version
+        self.model_watcher = None
+        if reload_interval:
+            self.model_watcher = ModelWatcher(engine, MODEL_FILES[engine], database, reload_interval, version=version,
+                                              notify=self.notify).start()
+
+        # Health metrics: counters since start and rolling latencies per stage
+        self.timer = StageTimer(enabled=True)
+        self.started = time.time()
+        self.clients = 0
+        self.counters = {"connections": 0, "requests": 0, "errors": 0, "faces": 0, "batches": 0}
+        self.queue = None
+
+    def apply_model_update(self):
+        update = self.model_watcher.take() if self.model_watcher is not None else None
+        if update is not None:
+            self.model_version, self.recognizer, self.names = update
+            if self.recognizer is None:
+                self.notify("showinfo", "Model Removed",
+                            f"Model version {self.model_version} has no users, nobody is recognized.")
+            else:
+                self.notify("showinfo", "Model Updated",
+                            f"Loaded model version {self.model_version} with {len(self.names)} users.")
+
+    def predict_batch(self, faces):
+        """(id_, conf) for grayscale faces, like FaceRecognizer.predict_faces; runs on the model thread."""
+        self.apply_model_update()
+        if self.recognizer is None:  # The model was removed while running
+            return [(-1, float("inf"))] * len(faces)
+        with self.timer.stage("predict"):
+            if not hasattr(self.recognizer, 'predict_batch'):
+                return [self.recognizer.predict(face) for face in faces]
+            labels, distances = self.recognizer.predict_batch(faces, k=2)
+            predictions = []
+            for (best, _), (best_dist, second_dist) in zip(labels, distances):
+                if second_dist - best_dist < self.match_margin:
+                    predictions.append((-1, float(best_dist)))  # Too close to call between two people
+                else:
+                    predictions.append((int(best), float(best_dist)))
+            return predictions
+
+    async def predict(self, faces):
+        """Queue faces for the next batch and wait for their predictions."""
+        if not faces:
+            return []
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((faces, future))
+        return await future
+
+    async def batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            count = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+            # Clients wait for each reply, so one request per client is all that can arrive
+            while count < self.max_batch and len(batch) < self.clients:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                count += len(item[0])
+
+            faces = [face for faces, _ in batch for face in faces]
+            try:
+                predictions = await loop.run_in_executor(self.model_thread, self.predict_batch, faces)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.counters["batches"] += 1
+            self.counters["faces"] += len(faces)
+            offset = 0
+            for faces, future in batch:
+                if not future.done():  # The client may have disconnected meanwhile
+                    future.set_result(predictions[offset:offset + len(faces)])
+                offset += len(faces)
+
+    def check_liveness(self, session, track_ids, faces, predictions, threshold):
+        """Result dicts and the landmark payload; runs the face mesh on the model thread."""
+        session.liveness.prune(track_ids)
+        results, landmarks_data = [], []
+        for track_id, face, (id_, conf) in zip(track_ids, faces, predictions):
+            live, landmarks = False, None
+            if conf < threshold:
+                state = session.liveness.state(track_id, id_)
+                if not state.verified:
+                    with self.timer.stage("face_mesh"):
+                        mesh = self.face_mesh.process(cv2.cvtColor(face, cv2.COLOR_BGR2RGB))
+                    if mesh.multi_face_landmarks:
+                        state.observe(landmarks_to_array(mesh.multi_face_landmarks[0]))
+                live, landmarks = state.verified, state.landmarks
+            if landmarks is not None:
+                landmarks_data.append(np.ascontiguousarray(landmarks, dtype=np.float32).tobytes())
+            results.append({"id": int(id_), "name": self.names.get(int(id_), "Unknown"), "confidence": float(conf),
+                            "live": bool(live), "landmarks": None if landmarks is None else len(landmarks)})
+        return results, b"".join(landmarks_data)
+
+    def detect(self, session, frame):
+        """Track IDs and BGR crops of the faces in a frame; runs on the model thread."""
+        with self.timer.stage("detect"):
+            tracks = session.scheduler.update(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+        return ([track.track_id for track in tracks], [track.box for track in tracks],
+                [frame[y:y + h, x:x + w] for (x, y, w, h) in (track.box for track in tracks)])
+
+    async def recognize(self, session, track_ids, faces, threshold, labels=None):
+        """Predict the faces without a label (all when labels is None) and check liveness."""
+        loop = asyncio.get_running_loop()
+        labels = labels or [None] * len(faces)
+        predicted = iter(await self.predict([cv2.cvtColor(face, cv2.COLOR_BGR2GRAY)
+                                             for face, label in zip(faces, labels) if label is None]))
+        predictions = [next(predicted) if label is None else (int(label), 0.0) for label in labels]
+        return await loop.run_in_executor(self.model_thread, self.check_liveness, session, track_ids, faces,
+                                          predictions, threshold)
+
+    async def dispatch(self, session, header, payload):
+        """Handle one request; returns the response header and payload."""
+        op = header.get("op")
+        if op == "health":
+            return self.health(), b""
+        threshold = float(header.get("threshold", self.threshold))
+        images = unpack_images(header.get("shapes", []), payload)
+        if op == "recognize":
+            track_ids = header.get("tracks", [])
+            labels = header.get("labels")
+            if len(track_ids) != len(images) or (labels is not None and len(labels) != len(images)):
+                raise ValueError("One track ID (and label, if any) is needed per face")
+            results, data = await self.recognize(session, track_ids, images, threshold, labels)
+            return {"results": results}, data
+        if op == "recognize_frame":
+            if len(images) != 1 or images[0].ndim != 3:
+                raise ValueError("recognize_frame takes one BGR frame")
+            track_ids, boxes, faces = await asyncio.get_running_loop().run_in_executor(
+                self.model_thread, self.detect, session, images[0])
+            results, data = await self.recognize(session, track_ids, faces, threshold)
+            for result, box in zip(results, boxes):
+                result["box"] = [int(v) for v in box]
+            return {"results": results}, data
+        raise ValueError(f"Unknown operation: {op}")
+
+    async def handle_client(self, reader, writer):
+        session = ClientSession(self.face_cascade, self.detect_interval, self.detect_scale)
+        self.clients += 1
+        self.counters["connections"] += 1
+        try:
+            while True:
+                try:
+                    header, payload = await read_message(reader)
+                except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+                    break  # Disconnected, or a message we can't resynchronize after
+                start = time.perf_counter()
+                self.counters["requests"] += 1
+                try:
+                    response, data = await self.dispatch(session, header, payload)
+                except Exception as e:
+                    self.counters["errors"] += 1
+                    response, data = {"error": f"{type(e).__name__}: {e}"}, b""
+                writer.write(encode_message(response, data))
+                await writer.drain()
+                self.timer.record("request", time.perf_counter() - start)
+        except ConnectionError:
+            pass
+        finally:
+            self.clients -= 1
+            writer.close()
+
+    def health(self):
+        """Status, counters since start and p50/p95/p99 of the request, predict, detect and face_mesh stages."""
+        uptime = time.time() - self.started
+        counters = self.counters
+        return {"status": "ok", "engine": self.engine, "model_version": self.model_version, "users": len(self.names),
+                "uptime_s": round(uptime, 1),
+                "clients": self.clients, **counters,
+                "mean_batch_faces": counters["faces"] / counters["batches"] if counters["batches"] else 0.0,
+                "faces_per_s": counters["faces"] / uptime if uptime else 0.0,
+                "stages": self.timer.summary()}
+
+    async def serve(self):
+        self.queue = asyncio.Queue()
+        batcher = asyncio.create_task(self.batcher())
+        server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        print(f"Recognition service on {self.host}:{self.port}: {self.engine} engine, {len(self.names)} users")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            if self.model_watcher is not None:
+                self.model_watcher.stop()
+            self.model_thread.shutdown(wait=False)
+
+    def run(self):
+        """Serve until interrupted."""
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            print("Recognition service stopped")
+
+
+if __name__ == "__main__":
+    RecognitionService().run()
@@ -1,151 +1,380 @@
 import cv2
-import os
-import csv
-import datetime
+import queue
+import time
 import mediapipe as mp
-from tkinter import messagebox  # Import messagebox for confirmation
+from frame_pipeline import FramePipeline
+from attendance_store import AttendanceStore
+from storage import DATABASE_FILE, AttendanceDatabase
+from face_tracker import DetectionScheduler
+from liveness import LivenessTracker, landmarks_to_array
+from identity_cache import UNKNOWN, IdentityCache
+from landmark_render import draw_landmarks
+from lbp_engine import MODEL_FILES, load_model, model_version
+from model_reload import ModelWatcher
+from frame_sources import open_source
+from instrumentation import StageTimer
+from notifications import show_message
+from recognition_client import ServiceError
 
 class FaceRecognizer:
-    def __init__(self, camera_index=0):  # External webcam
-        self.cap = cv2.VideoCapture(camera_index)
-        self.recognizer = cv2.face.LBPHFaceRecognizer_create()
-        self.recognizer.read('trainer.yml')
+    def __init__(self, camera_index=0, detect_interval=5, detect_scale=0.5,
+                 engine="opencv", threshold=50, match_margin=0.0, headless=False, timer=None,
+                 recognizer=None, attendance=None, stop_event=None, database=DATABASE_FILE,
+                 notifier=None, progress=None, landmark_mode="points", service=None,
+                 reload_interval=2.0, identity_window=5, min_votes=3, reverify_interval=15,
+                 preview=None):  # External webcam
+        # camera_index may also be a video file, an image directory or a source object (see frame_sources)
+        self.cap = open_source(camera_index)
+        # Headless mode makes no GUI calls: no windows, messages are printed
+        self.headless = headless
+        # Per-stage latency statistics, disabled (and nearly free) unless a StageTimer is passed
+        self.timer = timer or StageTimer()
+        # An already loaded model can be passed in so several recognizers share it
+        self.engine = engine
+        self.recognizer = recognizer
+        # With a RecognitionClient, predict and liveness run in the resident recognition
+        # service and the model and face mesh are only loaded here if it goes away
+        self.service = service
+        # Newly published models are loaded in the background every reload_interval seconds (None: never)
+        self.reload_interval = reload_interval
+        self.model_watcher = None
+        self.database = database
+        # Setting stop_event (threading or multiprocessing Event) ends recognize_faces after the current frame
+        self.stop_event = stop_event
+        # notifier(kind, title, message) replaces messageboxes when recognition runs on a worker
+        # thread, progress(frames, None, message) reports the frames shown
+        self.notifier = notifier
+        self.progress = progress
+        # preview(frame) receives the processed frames instead of an OpenCV window, for callers on a
+        # worker thread: HighGUI is not thread-safe and must run on the main thread on macOS
+        self.preview = preview
+        # Messages raised while processing frames, shown by the display stage on the GUI thread
+        self.notifications = queue.Queue()
+
+        # A face is accepted when its distance is below threshold and, with the numpy
+        # engine, the runner-up identity is at least match_margin further away
+        self.threshold = threshold
+        self.match_margin = match_margin
 
         # Haar Cascade for face detection
         self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
 
+        # Detect on a downscaled frame every few frames and track faces in between
+        self.scheduler = DetectionScheduler(self.face_cascade, detect_interval=detect_interval,
+                                            detect_scale=detect_scale)
+
+        # Users and attendance live in the SQLite database
+        self.db = AttendanceDatabase(database)
         self.names = self.load_names()
-        self.attendance_dir = "attendance"
-        os.makedirs(self.attendance_dir, exist_ok=True)
-        self.attendance_file = os.path.join(self.attendance_dir, f"{datetime.datetime.now().strftime('%Y-%m-%d')}.csv")
+        # Today's attendance indexed by ID, rolls over to the new day at midnight.
+        # Anything with is_marked/mark/close can stand in, e.g. a sink shared by several cameras
+        self.attendance = attendance or AttendanceStore(self.db)
 
         # Initialize MediaPipe Face Mesh
         self.mp_face_mesh = mp.solutions.face_mesh
-        self.face_mesh = self.mp_face_mesh.FaceMesh(max_num_faces=1)
+        self.face_mesh = None
+        if service is None:
+            self.load_models()
+
+        # "points" draws every mesh landmark, "contours" only the outlines, "none" nothing
+        self.landmark_mode = landmark_mode
 
-        # Store previous eyebrow positions to detect movement
-        self.previous_eyebrow_distance = None
+        # Eyebrow movement history per tracked face; face mesh only runs until a face passes
+        self.liveness = LivenessTracker()
+
+        # Label per tracked face by votes over its recent predictions; known faces are only
+        # predicted again every reverify_interval frames or when their box jumps
+        self.identities = IdentityCache(window=identity_window, min_votes=min_votes,
+                                        reverify_interval=reverify_interval)
 
         # Track attendance status (to keep color green after marking attendance)
         self.attendance_status = {}
+        self.marked_count = 0  # Attendance recorded during this session
+
+    def load_models(self):
+        """Load the recognizer model and face mesh for local recognition, unless already loaded."""
+        model_file = MODEL_FILES[self.engine]
+        version = model_version(model_file)  # Read first, a newer model is picked up by the watcher
+        if self.recognizer is None:
+            self.recognizer = load_model(self.engine, model_file)
+        if self.face_mesh is None:
+            self.face_mesh = self.mp_face_mesh.FaceMesh(max_num_faces=1)
+        if self.model_watcher is None and self.reload_interval:
+            self.model_watcher = ModelWatcher(self.engine, model_file, self.database, self.reload_interval,
+                                              version=version, notify=self.notify).start()
+
+    def apply_model_update(self):
+        """Swap in a model the watcher loaded, together with its names; called between frames."""
+        update = self.model_watcher.take()
+        if update is None:
+            return
+        version, self.recognizer, self.names = update
+        if self.recognizer is None:
+            self.notify("showinfo", "Model Removed", f"Model version {version} has no users, nobody is recognized.")
+        else:
+            self.notify("showinfo", "Model Updated", f"Loaded model version {version} with {len(self.names)} users.")
+
+    def notify(self, kind, title, message):
+        """Queue a messagebox for the display stage, processing may run on a worker thread."""
+        self.notifications.put((kind, title, message))
+
+    def show_notifications(self):
+        """Show queued messages, must be called from the thread that owns the windows."""
+        while not self.notifications.empty():
+            kind, title, message = self.notifications.get_nowait()
+            show_message(kind, title, message, self.notifier, self.headless)
 
     def load_names(self):
-        """Load user names and IDs from the names.csv file."""
+        """Load user names and IDs from the database."""
         names = {}
         try:
-            with open('names.csv', 'r') as file:
-                reader = csv.reader(file)
-                next(reader)  # Skip the header row
-                for row in reader:
-                    names[int(row[0])] = row[1]
+            names = self.db.names()
         except Exception as e:
-            messagebox.showerror("Error", f"Error loading names: {e}")
+            self.notify("showerror", "Error", f"Error loading names: {e}")
         return names
 
-    def attendance_already_marked(self, name):
+    def attendance_already_marked(self, id_):
         """Check if attendance has already been marked for the user today."""
         try:
-            if os.path.isfile(self.attendance_file):
-                with open(self.attendance_file, mode='r') as file:
-                    reader = csv.reader(file)
-                    for row in reader:
-                        if row[1] == name:  # Check by Name
-                            return True
+            return self.attendance.is_marked(id_)
         except Exception as e:
-            messagebox.showerror("Error", f"Error checking attendance: {e}")
+            self.notify("showerror", "Error", f"Error checking attendance: {e}")
         return False
 
     def mark_attendance(self, id_, name):
         """Mark attendance for the user if not already marked today."""
         try:
-            if not self.attendance_already_marked(name):
-                with open(self.attendance_file, mode='a', newline='') as file:
-                    writer = csv.writer(file)
-                    writer.writerow([id_, name, datetime.datetime.now().strftime('%H:%M:%S')])
-                    messagebox.showinfo(f"Attendance marked for {name} (ID: {id_}).")
-                    self.attendance_status[name] = True  # Set status to True after marking
+            if self.attendance.mark(id_, name):
+                self.marked_count += 1
+                self.notify("showinfo", "Attendance", f"Attendance marked for {name} (ID: {id_}).")
+                self.attendance_status[id_] = True  # Set status to True after marking
             else:
-                messagebox.showinfo(f"Attendance already marked for {name} today.")
+                self.notify("showinfo", "Attendance", f"Attendance already marked for {name} today.")
         except Exception as e:
-            messagebox.showerror("Error", f"Error marking attendance: {e}")
+            self.notify("showerror", "Error", f"Error marking attendance: {e}")
+
+    def draw_landmark_points(self, frame, landmarks, face_box, color):
+        """Draw the facial landmark points (normalized to the face box) within the detected face."""
+        draw_landmarks(frame, landmarks, face_box, color, self.landmark_mode)
+
+    def predict_faces(self, faces):
+        """Return (id_, conf) for each face, scored in one batch when the engine supports it."""
+        if not faces:
+            return []
+        if self.recognizer is None:  # The model was removed while running
+            return [(-1, float("inf"))] * len(faces)
+        if not hasattr(self.recognizer, 'predict_batch'):
+            return [self.recognizer.predict(face) for face in faces]
 
-    def calculate_eyebrow_movement(self, face_landmarks, face_box):
-        """Calculate the distance between eyebrows and eyes to detect eyebrow movement."""
-        x, y, w, h = face_box  # Face bounding box coordinates
+        labels, distances = self.recognizer.predict_batch(faces, k=2)
+        predictions = []
+        for (best, _), (best_dist, second_dist) in zip(labels, distances):
+            if second_dist - best_dist < self.match_margin:
+                predictions.append((-1, float(best_dist)))  # Too close to call between two people
+            else:
+                predictions.append((int(best), float(best_dist)))
+        return predictions
 
-        # Get landmark points for the left eyebrow and left eye
-        left_eyebrow_y = face_landmarks.landmark[105].y * h + y  # Left eyebrow (landmark 105)
-        left_eye_y = face_landmarks.landmark[33].y * h + y       # Left eye (landmark 33)
+    def process_frame(self, frame):
+        """Detect, recognize and annotate one frame; returns the frame to display."""
+        timer = self.timer
+        if self.model_watcher is not None:
+            self.apply_model_update()
+        with timer.stage("cvtColor"):
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        with timer.stage("detect"):
+            tracks = self.scheduler.update(gray)
+        if self.service is not None:
+            try:
+                recognized = self.recognize_remote(frame, tracks)
+            except ServiceError as e:
+                self.notify("showwarning", "Recognition Service", f"{e}. Continuing with the local model.")
+                self.service.close()
+                self.service = None
+                self.load_models()
+        if self.service is None:
+            recognized = self.recognize_local(frame, gray, tracks)
 
-        # Calculate the vertical distance between the eyebrow and the eye
-        eyebrow_to_eye_distance = abs(left_eyebrow_y - left_eye_y)
+        for (x, y, w, h), id_, name, landmarks in recognized:
+            cv2.putText(frame, name, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 0, 0), 2)
+            # Check if the attendance has already been marked for this person
+            color = (0, 255, 0) if self.attendance_status.get(id_) else (255, 0, 0)  # Green once marked, else blue
+            if landmarks is not None:
+                with timer.stage("draw"):
+                    self.draw_landmark_points(frame, landmarks, (x, y, w, h), color)
+        return frame
 
-        if self.previous_eyebrow_distance is not None:
-            # Check if the eyebrow moved up and down significantly
-            if abs(self.previous_eyebrow_distance - eyebrow_to_eye_distance) > 5:  # You can adjust this threshold
-                return True
+    def recognize_remote(self, frame, tracks):
+        """Predict and liveness by the recognition service; returns (box, id_, name, landmarks) per face.
 
-        # Update the previous distance for the next frame
-        self.previous_eyebrow_distance = eyebrow_to_eye_distance
-        return False
+        Labels are voted on in the identity cache like recognize_local's. Only faces that need
+        a prediction are predicted by the service; settled faces that are not live yet are sent
+        with their label, for the liveness check alone.
+        """
+        identities = self.identities
+        identities.prune(track.track_id for track in tracks)
+        self.liveness.prune(track.track_id for track in tracks)
+        pending = [track for track in tracks if identities.needs_predict(track)]
+        checking = []
+        for track in tracks:
+            identity = identities.identity(track.track_id)
+            if track in pending or identity is None or self.attendance_status.get(identity.label):
+                continue
+            if not self.liveness.state(track.track_id, identity.label).verified:
+                checking.append((track, identity.label))
 
-    def draw_landmark_points(self, frame, face_landmarks, face_box, color):
-        """Draw all 468 facial landmark points only within the detected face."""
-        x, y, w, h = face_box  # Get the face bounding box coordinates
-        for landmark in face_landmarks.landmark:
-            # Convert normalized landmark coordinates to the bounding box's pixel values
-            landmark_x = int(landmark.x * w) + x
-            landmark_y = int(landmark.y * h) + y
+        sent = pending + [track for track, _ in checking]
+        results = []
+        if sent:
+            faces = [frame[y:y + h, x:x + w] for (x, y, w, h) in (track.box for track in sent)]
+            labels = [None] * len(pending) + [label for _, label in checking]
+            with self.timer.stage("service"):
+                results = self.service.recognize(faces, [track.track_id for track in sent], self.threshold, labels)
+        results = {track.track_id: result for track, result in zip(sent, results)}
+        identities.update(tracks, {track.track_id: (results[track.track_id]["id"]
+                                                    if results[track.track_id]["confidence"] < self.threshold
+                                                    else UNKNOWN, results[track.track_id]["confidence"])
+                                   for track in pending})
 
-            # Draw a small circle for each landmark point only on the face
-            cv2.circle(frame, (landmark_x, landmark_y), 1, color, -1)
+        recognized = []
+        for track in tracks:
+            identity = identities.identity(track.track_id)
+            if identity is None:  # Unknown, or not enough agreeing predictions yet
+                continue
+            id_ = identity.label
+            state = self.liveness.state(track.track_id, id_)
+            result = results.get(track.track_id)
+            if result is not None and result["id"] == id_ and result["confidence"] < self.threshold:
+                # The service reloads names with every new model, so its names are the newest
+                self.names[id_] = result["name"]
+                if result["landmarks"] is not None:
+                    state.landmarks = result["landmarks"]
+                state.verified = state.verified or result["live"]
+            name = self.names.get(id_, "Unknown")
+            recognized.append((track.box, id_, name, state.landmarks))
+            # Like recognize_local, a face whose latest prediction disagreed with its label can't pass
+            if identity.settled and state.verified and not self.attendance_status.get(id_) \
+                    and not self.attendance_already_marked(id_):
+                self.mark_attendance(id_, name)
+        return recognized
 
-    def recognize_faces(self):
-        while True:
-            ret, frame = self.cap.read()
-            if not ret:
-                messagebox.showerror("Error", "Failed to grab frame. Exiting...")
-                break
+    def recognize_local(self, frame, gray, tracks):
+        """Predict and liveness with the local model; returns (box, id_, name, landmarks) per face."""
+        timer = self.timer
+        identities = self.identities
+        identities.prune(track.track_id for track in tracks)
+        pending = [track for track in tracks if identities.needs_predict(track)]
+        # Full resolution boxes for predict
+        faces = [gray[y:y + h, x:x + w] for (x, y, w, h) in (track.box for track in pending)]
+        with timer.stage("predict"):
+            predictions = self.predict_faces(faces)
+        # Adjust threshold based on your dataset
+        identities.update(tracks, {track.track_id: (id_ if conf < self.threshold else UNKNOWN, conf)
+                                   for track, (id_, conf) in zip(pending, predictions)})
 
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)  # For face mesh processing
-            faces = self.face_cascade.detectMultiScale(gray, 1.3, 5)
-
-            for (x, y, w, h) in faces:
-                face = gray[y:y + h, x:x + w]
-                id_, conf = self.recognizer.predict(face)
-                name = self.names.get(id_, "Unknown")
-                color = (255, 0, 0)  # Default to blue (BGR) for not marked attendance
-
-                if conf < 50:  # Adjust threshold based on your dataset
-                    cv2.putText(frame, name, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 0, 0), 2)
-
-                    # Detect face mesh landmarks
-                    face_rgb = rgb_frame[y:y + h, x:x + w]
-                    results = self.face_mesh.process(face_rgb)
-
-                    if results.multi_face_landmarks:
-                        for face_landmarks in results.multi_face_landmarks:
-                            # Check if the attendance has already been marked for this person
-                            if name in self.attendance_status and self.attendance_status[name]:
-                                color = (0, 255, 0)  # Green after attendance is marked
-                            else:
-                                # Check if the eyebrows moved up and down
-                                if self.calculate_eyebrow_movement(face_landmarks, (x, y, w, h)):
-                                    # Mark attendance if the eyebrow movement is detected
-                                    if not self.attendance_already_marked(name):
-                                        self.mark_attendance(id_, name)
-                                        color = (0, 255, 0)  # Change to green
-
-                            self.draw_landmark_points(frame, face_landmarks, (x, y, w, h), color)
+        # Liveness first, so the mesh sees faces before anything is drawn on the frame
+        self.liveness.prune(track.track_id for track in tracks)
+        states = []
+        for track in tracks:
+            identity = identities.identity(track.track_id)
+            if identity is None:  # Unknown, or not enough agreeing predictions yet
+                continue
+            id_ = identity.label
+            name = self.names.get(id_, "Unknown")
+            state = self.liveness.state(track.track_id, id_)
+            states.append((track.box, id_, name, state))
+
+            # Faces that passed, or were marked this session, keep their last landmarks and skip the mesh.
+            # A face whose latest prediction disagreed with its label can't pass until it is settled again
+            if state.verified or self.attendance_status.get(id_) or not identity.settled:
+                continue
+            x, y, w, h = track.box
+            with timer.stage("face_mesh"):
+                # Detect face mesh landmarks on the face only
+                face_rgb = cv2.cvtColor(frame[y:y + h, x:x + w], cv2.COLOR_BGR2RGB)
+                results = self.face_mesh.process(face_rgb)
 
+            if results.multi_face_landmarks:
+                # Check if the eyebrows moved up and down
+                if state.observe(landmarks_to_array(results.multi_face_landmarks[0])):
+                    # Mark attendance if the eyebrow movement is detected
+                    if not self.attendance_already_marked(id_):
+                        self.mark_attendance(id_, name)
+        return [(box, id_, name, state.landmarks) for box, id_, name, state in states]
+
+    def display_frame(self, frame):
+        """Show a processed frame; returns False when the user asks to quit."""
+        self.show_notifications()
+        self.timer.frame_done()
+        if self.progress:
+            self.progress(self.scheduler.frames, None, f"{self.marked_count} marked")
+        if self.stop_event is not None and self.stop_event.is_set():
+            return False
+        if self.preview is not None:
+            self.timer.draw_overlay(frame)
+            self.preview(frame)
+            return True
+        if self.headless:
+            return True
+        self.timer.draw_overlay(frame)
+        with self.timer.stage("imshow"):
             cv2.imshow("Recognize Faces with Eyebrow Movement", frame)
+            key = cv2.waitKey(1)
+        return not (key & 0xFF == ord('q'))
+
+    def recognize_faces(self, threaded=True, drop_policy=None):
+        """Run recognition until 'q' is pressed or the source runs out of frames.
+
+        threaded=True grabs frames on a capture thread and processes them on a worker,
+        dropping stale frames by drop_policy (see FramePipeline) when processing lags.
+        By default live cameras drop the oldest frame and recordings drop nothing.
+        Returns the achieved frame rate and detection load, which are also printed when
+        headless or profiling.
+        """
+        live = getattr(self.cap, 'is_live', True)
+        start = time.perf_counter()
+        capture_failed = False
+        try:
+            if threaded:
+                policy = drop_policy or ("oldest" if live else "block")
+                pipeline = FramePipeline(self.cap, self.process_frame, drop_policy=policy, timer=self.timer).start()
+                try:
+                    for frame in pipeline.results():
+                        if not self.display_frame(frame):
+                            break
+                    capture_failed = pipeline.capture_failed
+                finally:
+                    pipeline.stop()
+            else:
+                while True:
+                    with self.timer.stage("read"):
+                        ret, frame = self.cap.read()
+                    if not ret:
+                        capture_failed = True
+                        break
 
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
+                    if not self.display_frame(self.process_frame(frame)):
+                        break
 
-        self.cap.release()
-        cv2.destroyAllWindows()
+            # The end of a recording is not an error
+            if capture_failed and live:
+                self.notify("showerror", "Error", "Failed to grab frame. Exiting...")
+        finally:
+            self.show_notifications()
+            self.timer.close()
+            self.attendance.close()
+            self.db.close()
+            if self.service is not None:
+                self.service.close()
+            if self.model_watcher is not None:
+                self.model_watcher.stop()
+            self.cap.release()
+            if not self.headless and self.preview is None:
+                cv2.destroyAllWindows()
+            report = f"{self.scheduler.report(time.perf_counter() - start)}, {self.identities.report()}"
+            if self.headless or self.timer.enabled:
+                print(f"Recognition: {report}")
+        return report
 
 if __name__ == "__main__":
     try:
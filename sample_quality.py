@@ -0,0 +1,80 @@
+import numpy as np
+import cv2
+
+# Face mesh landmarks used for the head pose estimate
+NOSE_TIP = 1
+LEFT_EYE_OUTER = 33
+RIGHT_EYE_OUTER = 263
+
+
+def sharpness(gray):
+    """Variance of the Laplacian; low values mean a blurry image."""
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+def dhash(gray, size=8):
+    """Difference hash: one bit per horizontally adjacent pixel pair of a (size+1) x size thumbnail."""
+    thumbnail = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (thumbnail[:, 1:] > thumbnail[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+def head_pose(landmarks):
+    """Rough (yaw, pitch, roll) of a face from (n, 2) mesh landmarks: nose offset from the eye
+    midpoint in units of eye distance, and the angle of the eye line."""
+    left, right, nose = landmarks[LEFT_EYE_OUTER], landmarks[RIGHT_EYE_OUTER], landmarks[NOSE_TIP]
+    eye_vector = right - left
+    eye_distance = float(np.hypot(*eye_vector)) or 1.0
+    offset = (nose - (left + right) / 2) / eye_distance
+    return np.array([offset[0], offset[1], np.arctan2(eye_vector[1], eye_vector[0])], dtype=np.float32)
+
+
+class SampleGate:
+    """Decides which captured faces are worth keeping for training.
+
+    A face is rejected when it is blurry (sharpness below min_sharpness), or when it looks
+    like a sample already kept (dHash within min_hash_distance bits) and its head pose is
+    not at least min_pose_distance away from every kept pose. Fewer, more varied samples
+    give a smaller model and faster predictions at the same accuracy.
+    """
+
+    def __init__(self, min_sharpness=50.0, min_hash_distance=6, min_pose_distance=0.08):
+        self.min_sharpness = min_sharpness
+        self.min_hash_distance = min_hash_distance
+        self.min_pose_distance = min_pose_distance
+        self.hashes = []
+        self.poses = []
+        self.rejected = {"blurry": 0, "duplicate": 0}
+
+    def new_pose(self, pose):
+        if pose is None:
+            return False
+        if not self.poses:
+            return True
+        return float(np.min(np.linalg.norm(np.array(self.poses) - pose, axis=1))) >= self.min_pose_distance
+
+    def accept(self, gray, pose=None):
+        """Return True and remember the sample if it should be saved; pose is from head_pose() or None."""
+        if sharpness(gray) < self.min_sharpness:
+            self.rejected["blurry"] += 1
+            return False
+        face_hash = dhash(gray)
+        similar = any(hamming(face_hash, kept) < self.min_hash_distance for kept in self.hashes)
+        if similar and not self.new_pose(pose):
+            self.rejected["duplicate"] += 1
+            return False
+        self.hashes.append(face_hash)
+        if pose is not None:
+            self.poses.append(pose)
+        return True
+
+    @property
+    def rejected_count(self):
+        return sum(self.rejected.values())
+
+    def summary(self):
+        return ", ".join(f"{count} {reason}" for reason, count in self.rejected.items()) + " rejected"
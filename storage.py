@@ -0,0 +1,202 @@
+import io
+import os
+import csv
+import sqlite3
+import threading
+
+DATABASE_FILE = 'attendance.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS attendance (
+    user_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    day TEXT NOT NULL,
+    time TEXT NOT NULL,
+    UNIQUE (user_id, day)
+);
+CREATE INDEX IF NOT EXISTS attendance_day ON attendance (day, time);
+CREATE INDEX IF NOT EXISTS attendance_user ON attendance (user_id, day);
+CREATE TABLE IF NOT EXISTS imported_files (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL  -- Bytes imported so far
+);
+CREATE TABLE IF NOT EXISTS deleted_users (
+    id INTEGER PRIMARY KEY
+);
+"""
+SCHEMA_VERSION = 2  # 1: CSVs imported once, without recording the imported files
+
+
+def read_rows(path, offset):
+    """CSV rows of a file from byte offset up to its last complete line, and the offset after them.
+
+    A line still being written by the older app is left for the next import.
+    """
+    with open(path, 'rb') as file:
+        file.seek(offset)
+        data = file.read()
+    end = data.rfind(b'\n') + 1
+    text = data[:end].decode('utf-8', errors='replace')
+    return list(csv.reader(io.StringIO(text, newline=''))), offset + end
+
+
+class AttendanceDatabase:
+    """Users and attendance events in indexed SQLite tables.
+
+    Attendance rows keep the user's name at the time of marking, like the daily CSV files
+    did, so history survives deleting a user. names.csv and attendance/*.csv, still written
+    by older versions of the app, are imported as they grow: only rows appended since the
+    last import are read. Deleted users are recorded, so names.csv can't bring them back.
+    """
+
+    def __init__(self, path=DATABASE_FILE, names_file='names.csv', attendance_dir='attendance'):
+        self.path = path
+        # One connection shared by the GUI and worker threads, serialized by the lock
+        self.connection = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self.lock = threading.RLock()
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")  # Readers don't block the attendance writer
+            self.connection.executescript(SCHEMA)
+            version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version == 1:
+            # names.csv was imported before deletions were recorded; users deleted since must
+            # not come back, so only rows appended from now on are imported
+            self.skip_imported(names_file)
+        if version < SCHEMA_VERSION:
+            with self.lock, self.connection:
+                self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.import_csvs(names_file, attendance_dir)
+
+    def query(self, sql, params=()):
+        with self.lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    def execute(self, sql, params=()):
+        """Run a statement in its own transaction and return the number of changed rows."""
+        with self.lock, self.connection:
+            return self.connection.execute(sql, params).rowcount
+
+    # Users
+
+    def user_exists(self, user_id):
+        return bool(self.query("SELECT 1 FROM users WHERE id = ?", (int(user_id),)))
+
+    def add_user(self, user_id, name):
+        """Add a user; returns False if the ID is already taken."""
+        with self.lock, self.connection:
+            if self.connection.execute("INSERT OR IGNORE INTO users (id, name) VALUES (?, ?)",
+                                       (int(user_id), name)).rowcount != 1:
+                return False
+            self.connection.execute("DELETE FROM deleted_users WHERE id = ?", (int(user_id),))
+            return True
+
+    def delete_user(self, user_id):
+        """Delete a user and remember the deletion, so importing names.csv skips the ID."""
+        with self.lock, self.connection:
+            self.connection.execute("INSERT OR IGNORE INTO deleted_users (id) VALUES (?)", (int(user_id),))
+            return self.connection.execute("DELETE FROM users WHERE id = ?", (int(user_id),)).rowcount == 1
+
+    def users(self):
+        """All users as (id, name) rows ordered by ID."""
+        return self.query("SELECT id, name FROM users ORDER BY id")
+
+    def names(self):
+        return dict(self.users())
+
+    # Attendance
+
+    def attendance_days(self):
+        """Days with attendance, newest first."""
+        return [row[0] for row in self.query("SELECT DISTINCT day FROM attendance ORDER BY day DESC")]
+
+    def attendance_for_day(self, day):
+        """(id, name, time) rows of a day in marking order."""
+        return self.query("SELECT user_id, name, time FROM attendance WHERE day = ? ORDER BY time, rowid", (day,))
+
+    def attendance_for_user(self, user_id):
+        """(day, time) rows of a user, oldest first."""
+        return self.query("SELECT day, time FROM attendance WHERE user_id = ? ORDER BY day", (int(user_id),))
+
+    def attendance_after(self, day, after_rowid=0):
+        """(rowid, id, name, time) rows of a day added after the given rowid, in insertion order."""
+        return self.query("SELECT rowid, user_id, name, time FROM attendance WHERE day = ? AND rowid > ? ORDER BY rowid",
+                          (day, after_rowid))
+
+    def marked_ids(self, day):
+        return {row[0] for row in self.query("SELECT user_id FROM attendance WHERE day = ?", (day,))}
+
+    def is_marked(self, user_id, day):
+        return bool(self.query("SELECT 1 FROM attendance WHERE user_id = ? AND day = ?", (int(user_id), day)))
+
+    def mark(self, user_id, name, day, time):
+        """Record attendance unless the user is already marked that day; returns True if recorded."""
+        return self.execute("INSERT OR IGNORE INTO attendance (user_id, name, day, time) VALUES (?, ?, ?, ?)",
+                            (int(user_id), name, day, time)) == 1
+
+    def data_version(self):
+        """Changes whenever another connection (e.g. a recognition process) commits to the database."""
+        return self.query("PRAGMA data_version")[0][0]
+
+    # Import
+
+    def changed_files(self, paths):
+        """(path, mtime, offset) of the files with rows not imported yet; offset is where those rows
+        start, 0 for new files and files that shrank (rewritten) since their last import."""
+        rows = self.query("SELECT path, mtime, size FROM imported_files")
+        imported = {path: (mtime, size) for path, mtime, size in rows}
+        changed = []
+        for path in paths:
+            stat = os.stat(path)
+            mtime, size = imported.get(path, (None, 0))
+            if (mtime, size) != (stat.st_mtime, stat.st_size):
+                changed.append((path, stat.st_mtime, size if size <= stat.st_size else 0))
+        return changed
+
+    def skip_imported(self, path):
+        """Record a file as imported up to its current end without reading it."""
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            self.execute("INSERT OR REPLACE INTO imported_files (path, mtime, size) VALUES (?, ?, ?)",
+                         (path, stat.st_mtime, stat.st_size))
+
+    def import_csvs(self, names_file='names.csv', attendance_dir='attendance'):
+        """Import the rows appended to names.csv and attendance/YYYY-MM-DD.csv since they were last
+        imported; rows already present and deleted users are skipped."""
+        paths = [names_file] if os.path.isfile(names_file) else []
+        if os.path.isdir(attendance_dir):
+            paths += [os.path.join(attendance_dir, filename) for filename in sorted(os.listdir(attendance_dir))
+                      if filename.endswith('.csv')]
+        changed = self.changed_files(paths)
+        if not changed:
+            return 0, 0
+
+        users, events, imported = [], [], []
+        for path, mtime, offset in changed:
+            rows, end = read_rows(path, offset)
+            imported.append((path, mtime, end))
+            if path == names_file:
+                # The header is only at the start; it doesn't begin with a numeric ID anyway
+                users = [(int(row[0]), row[1].strip(), int(row[0])) for row in rows
+                         if len(row) >= 2 and row[0].strip().isdigit()]
+            else:
+                day = os.path.basename(path)[:-len('.csv')]
+                events.extend((int(row[0]), row[1], day, row[2]) for row in rows
+                              if len(row) >= 3 and row[0].strip().isdigit())
+
+        with self.lock, self.connection:
+            self.connection.executemany("INSERT OR IGNORE INTO users (id, name) SELECT ?, ? WHERE NOT EXISTS "
+                                        "(SELECT 1 FROM deleted_users WHERE id = ?)", users)
+            self.connection.executemany("INSERT OR IGNORE INTO attendance (user_id, name, day, time) "
+                                        "VALUES (?, ?, ?, ?)", events)
+            self.connection.executemany("INSERT OR REPLACE INTO imported_files (path, mtime, size) VALUES (?, ?, ?)",
+                                        imported)
+        return len(users), len(events)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,131 @@
+import time
+import queue
+import threading
+
+
+class Task:
+    """Handle passed to a background job: progress and messages go to the GUI, cancel() asks it to stop.
+
+    Jobs check `cancelled` (or hand `stop_event` to code that polls an Event) and return early.
+    """
+
+    def __init__(self, name, events, progress_interval=0.1):
+        self.name = name
+        self.events = events
+        self.stop_event = threading.Event()
+        self.progress_interval = progress_interval
+        self.last_progress = 0.0
+        self.thread = None
+        self.frame = None  # Latest preview frame not yet shown
+        self.frame_lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self.stop_event.is_set()
+
+    def cancel(self):
+        self.stop_event.set()
+
+    def progress(self, done, total=None, message=""):
+        """Report progress; updates closer together than progress_interval are dropped, except the last one."""
+        now = time.perf_counter()
+        if now - self.last_progress < self.progress_interval and (total is None or done < total):
+            return
+        self.last_progress = now
+        self.events.put(("progress", self, (done, total, message)))
+
+    def notify(self, kind, title, message):
+        """Send a message (a messagebox function name, title and text) to be shown by the GUI."""
+        self.events.put(("notify", self, (kind, title, message)))
+
+    def preview(self, frame):
+        """Send a camera frame to be shown by the GUI; frames the GUI had no time for are replaced."""
+        with self.frame_lock:
+            pending, self.frame = self.frame is not None, frame
+        if not pending:
+            self.events.put(("frame", self, None))
+
+    def take_frame(self):
+        with self.frame_lock:
+            frame, self.frame = self.frame, None
+        return frame
+
+
+class TaskExecutor:
+    """Runs long jobs on worker threads and delivers their events on the Tk thread.
+
+    Workers only put events on a queue; the queue is drained with root.after while jobs run,
+    so every callback, including showing messages and preview frames, happens on the GUI thread.
+    """
+
+    def __init__(self, root, poll_interval_ms=100, on_notify=None, on_frame=None):
+        self.root = root
+        self.poll_interval_ms = poll_interval_ms
+        self.on_notify = on_notify
+        self.on_frame = on_frame
+        self.events = queue.Queue()
+        self.tasks = {}  # Running task -> callbacks
+        self.polling = None
+
+    def submit(self, name, work, on_progress=None, on_done=None, on_error=None):
+        """Run work(task) on a new thread; on_done(task, result) or on_error(task, exception) follow it."""
+        task = Task(name, self.events)
+        self.tasks[task] = (on_progress, on_done, on_error)
+
+        def run():
+            try:
+                result = work(task)
+            except Exception as e:
+                self.events.put(("error", task, e))
+            else:
+                self.events.put(("done", task, result))
+
+        task.thread = threading.Thread(target=run, name=name, daemon=True)
+        task.thread.start()
+        if self.polling is None:
+            self.polling = self.root.after(self.poll_interval_ms, self.poll)
+        return task
+
+    @property
+    def busy(self):
+        return bool(self.tasks)
+
+    def cancel_all(self):
+        for task in self.tasks:
+            task.cancel()
+
+    def shutdown(self, timeout=5.0):
+        """Cancel every job and wait up to timeout seconds for the workers to stop."""
+        self.cancel_all()
+        deadline = time.perf_counter() + timeout
+        for task in list(self.tasks):
+            task.thread.join(max(0.0, deadline - time.perf_counter()))
+
+    def poll(self):
+        """Deliver queued events, and keep polling while any job is running."""
+        self.polling = None
+        while True:
+            try:
+                kind, task, payload = self.events.get_nowait()
+            except queue.Empty:
+                break
+            on_progress, on_done, on_error = self.tasks.get(task, (None, None, None))
+            if kind == "progress":
+                if on_progress:
+                    on_progress(task, *payload)
+            elif kind == "notify":
+                if self.on_notify:
+                    self.on_notify(task, *payload)
+            elif kind == "frame":
+                frame = task.take_frame()
+                if self.on_frame and frame is not None and task in self.tasks:
+                    self.on_frame(task, frame)
+            else:
+                del self.tasks[task]  # Before the callback, which may start the next job
+                callback = on_done if kind == "done" else on_error
+                if callback:
+                    callback(task, payload)
+                elif kind == "error" and self.on_notify:
+                    self.on_notify(task, "showerror", "Error", f"{task.name} failed: {payload}")
+        if self.tasks:
+            self.polling = self.root.after(self.poll_interval_ms, self.poll)
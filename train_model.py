@@ -1,53 +1,259 @@
-from tkinter import messagebox  # Import messagebox for confirmation
 import cv2
 import os
+import json
 import numpy as np
+from face_dataset import FaceDataset
+from lbp_engine import MODEL_FILES, create_recognizer, current_model_file, publish_model, retract_model
+from model_compaction import compact
+from notifications import show_message
+
+TRAINING_STEPS = 3  # Scan, load/train, save: the steps reported to a progress callback
 
 class Trainer:
-    def __init__(self):
-        self.recognizer = cv2.face.LBPHFaceRecognizer_create()
+    def __init__(self, engine="opencv", headless=False, notifier=None, progress=None, stop_event=None,
+                 prototypes=None):
+        # "opencv" uses cv2.face LBPH, "numpy" the batched LBPHRecognizer from lbp_engine
+        self.engine = engine
+        self.recognizer = create_recognizer(engine)
         self.faces_dir = "Faces/"
-        self.model_file = 'trainer.yml'
+        self.model_file = MODEL_FILES[engine]
+        # Keep at most this many medoid histograms per user (see model_compaction); the numpy
+        # engine only, since an OpenCV model can't be loaded with chosen histograms
+        if prototypes and engine != "numpy":
+            raise ValueError("Model compaction needs the numpy engine")
+        self.prototypes = prototypes
+        # Headless mode prints messages instead of showing messageboxes
+        self.headless = headless
+        # notifier(kind, title, message) replaces messageboxes when training runs on a worker thread,
+        # progress(step, TRAINING_STEPS, message) reports the stage and setting stop_event cancels
+        # before the next stage (a running train() call can't be interrupted)
+        self.notifier = notifier
+        self.progress = progress
+        self.stop_event = stop_event
+        # Records which user directories and images are already inside the model
+        self.manifest_file = 'trainer_manifest.json'
+        # Packed grayscale cache of Faces/, decoded in parallel
+        self.dataset = FaceDataset(self.faces_dir)
+
+    def notify(self, kind, title, message):
+        """Show a messagebox, hand it to the notifier, or print it in headless mode."""
+        show_message(kind, title, message, self.notifier, self.headless)
+
+    def report(self, step, message):
+        """Report progress; returns False if training was cancelled."""
+        if self.progress:
+            self.progress(step, TRAINING_STEPS, message)
+        if self.stop_event and self.stop_event.is_set():
+            self.notify("showinfo", "Cancelled", "Training cancelled, the saved model is unchanged.")
+            return False
+        return True
+
+    def scan_faces(self):
+        """Return {dir_name: {"id": user_id, "images": {img_name: [mtime_ns, size]}}} for the faces directory."""
+        entries = {}
+        for dir_name in os.listdir(self.faces_dir):
+            dir_path = os.path.join(self.faces_dir, dir_name)
+            if not os.path.isdir(dir_path):
+                continue
+            images = {}
+            for img in os.scandir(dir_path):
+                if img.is_file():
+                    stat = img.stat()
+                    images[img.name] = [stat.st_mtime_ns, stat.st_size]
+            entries[dir_name] = {"id": int(dir_name.split('_')[0]), "images": images}
+        return entries
+
+    def read_manifest(self):
+        """The manifest of this engine's model as a dict, or None if there is none."""
+        try:
+            with open(self.manifest_file, 'r') as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(manifest, dict) or manifest.get("model_file", self.model_file) != self.model_file:
+            return None  # Manifest describes the other engine's model
+        return manifest
+
+    def load_manifest(self):
+        """Load the training manifest, or return None if the model has no usable manifest.
+
+        A model compacted before keeps being compacted: without an explicit prototypes
+        setting, the one recorded in the manifest is used for updates and rebuilds.
+        """
+        model_file = current_model_file(self.model_file)
+        if not (model_file and os.path.isfile(model_file)):
+            return None
+        manifest = self.read_manifest()
+        if manifest is None or not isinstance(manifest.get("users"), dict):
+            return None
+        if self.prototypes is None:
+            self.prototypes = manifest.get("prototypes")
+        return manifest["users"]
 
-    def train_faces(self):
-        faces, ids = [], []
+    def save_manifest(self, entries):
+        """Write the manifest describing what the saved model was trained on."""
+        tmp_file = self.manifest_file + '.tmp'
+        with open(tmp_file, 'w') as file:
+            json.dump({"version": 1, "model_file": self.model_file, "prototypes": self.prototypes, "users": entries},
+                      file)
+        os.replace(tmp_file, self.manifest_file)
+
+    def load_images(self, entries, only=None):
+        """Return faces and ids for entries; `only` maps dir_name -> image names to restrict loading.
+
+        Images come from the packed dataset cache, which decodes changed directories in parallel.
+        Images it could not decode are dropped from entries, so the manifest saved from entries
+        lists only images that are in the model and a later incremental run tries them again.
+        """
+        faces_arr, ids_arr, index = self.dataset.load(entries)
+        if self.dataset.skipped:
+            self.notify("showwarning", "Warning", f"Could not read {len(self.dataset.skipped)} images, e.g. "
+                                                  f"{self.dataset.skipped[0]}. Skipping...")
+
+        rows = []
+        for dir_name, entry in entries.items():
+            cached = index.get(dir_name)
+            decoded = set(cached["images"]) if cached is not None else set()
+            entry["images"] = {name: stamp for name, stamp in entry["images"].items() if name in decoded}
+            if cached is None:
+                continue
+            img_names = entry["images"] if only is None else only.get(dir_name, ())
+            positions = {name: cached["start"] + i for i, name in enumerate(cached["images"])}
+            rows.extend(positions[name] for name in img_names if name in positions)
+
+        # Rows are views into the memory map, nothing is copied until training
+        return [faces_arr[row] for row in rows], ids_arr[rows].tolist()
+
+    def train_faces(self, incremental=False):
+        """Train the model on Faces/; with incremental=True only new images are fed to the existing model."""
         if not os.path.exists(self.faces_dir):
             # print(f"Directory {self.faces_dir} does not exist. No faces to train.")
             return
 
-        for dir_name in os.listdir(self.faces_dir):
-            user_id = int(dir_name.split('_')[0])
-            dir_path = os.path.join(self.faces_dir, dir_name)
+        if not self.report(0, "Scanning faces"):
+            return
+        entries = self.scan_faces()
+        manifest = self.load_manifest() if incremental else None
+        if manifest is not None:
+            changes = self.diff_manifest(manifest, entries)
+            if changes is not None:
+                self.update_faces(entries, changes)
+                return
 
-            for img_name in os.listdir(dir_path):
-                img_path = os.path.join(dir_path, img_name)
-                gray_img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
+        self.rebuild(entries)
 
-                if gray_img is None:
-                    messagebox.showwarning("Warning", f"Could not read image {img_path}. Skipping...")
-                    continue
+    def diff_manifest(self, manifest, entries):
+        """Return {dir_name: [new image names]} or None when the model can't be updated in place.
 
-                faces.append(gray_img)
-                ids.append(user_id)
+        LBPH can only add histograms, so removed or rewritten images force a rebuild.
+        """
+        changes = {}
+        for dir_name in manifest:
+            if dir_name not in entries:
+                return None  # A user directory disappeared
+        for dir_name, entry in entries.items():
+            known = manifest.get(dir_name, {"images": {}})["images"]
+            for img_name, stamp in known.items():
+                if entry["images"].get(img_name) != stamp:
+                    return None  # An image was removed or changed
+            new_images = [name for name in entry["images"] if name not in known]
+            if new_images:
+                changes[dir_name] = new_images
+        return changes
+
+    def update_faces(self, entries, changes):
+        """Feed only the new images through LBPHFaceRecognizer.update()."""
+        if not changes:
+            self.notify("showinfo", "Up to date", "Model already includes all captured faces.")
+            return
+
+        faces, ids = self.load_images(entries, only=changes)
+        if not self.report(1, f"Updating model with {len(faces)} images"):
+            return
+        if len(faces) == 0:
+            new_images = sum(len(images) for images in changes.values())
+            self.notify("showwarning", "Warning", f"None of the {new_images} new images could be read, "
+                                                  f"the model is unchanged.")
+            return
+
+        try:
+            self.notify("showinfo", "Completed", f"Updating model with {len(faces)} new face images.")
+            self.recognizer.read(current_model_file(self.model_file))
+            self.recognizer.update(faces, np.array(ids))
+            self.compact_model()
+            if self.report(2, "Saving model") and self.save_model():
+                self.save_manifest(entries)
+        except Exception as e:
+            self.notify("showerror", "Error", f"Error during training: {e}")
+
+    def rebuild(self, entries):
+        """Train a fresh model on every image listed in entries."""
+        if self.prototypes is None:
+            # A full retrain keeps the compaction recorded for the previous model
+            manifest = self.read_manifest()
+            self.prototypes = manifest.get("prototypes") if manifest else None
+        faces, ids = self.load_images(entries)
+        if not self.report(1, f"Training on {len(faces)} images"):
+            return
 
         if len(faces) == 0:
-            messagebox.showerror("Error", "No valid face data found for training.")
+            self.notify("showerror", "Error", "No valid face data found for training.")
             return
 
         try:
-            messagebox.showinfo("Completed", f"Training on {len(faces)} face images.")
+            self.notify("showinfo", "Completed", f"Training on {len(faces)} face images.")
             self.recognizer.train(faces, np.array(ids))
-            self.save_model()
+            self.compact_model()
+            if self.report(2, "Saving model") and self.save_model():
+                self.save_manifest(entries)
         except Exception as e:
-            messagebox.showerror("Error", f"Error during training: {e}")
+            self.notify("showerror", "Error", f"Error during training: {e}")
+
+    def record_prototypes(self, prototypes):
+        """Note in the manifest that the saved model was compacted to prototypes histograms per user."""
+        entries = self.load_manifest()
+        if entries is not None:
+            self.prototypes = prototypes
+            self.save_manifest(entries)
+
+    def compact_model(self):
+        if self.prototypes:
+            self.recognizer = compact(self.recognizer, self.prototypes)
+
+    def remove_user(self, user_id):
+        """Rebuild the model without user_id, using only the images recorded in the manifest."""
+        manifest = self.load_manifest()
+        if manifest is None:
+            # Nothing to scope the rebuild to, fall back to a full retrain
+            self.train_faces()
+            return
+
+        user_id = int(user_id)
+        remaining = {dir_name: entry for dir_name, entry in manifest.items() if entry["id"] != user_id}
+        if len(remaining) == len(manifest):
+            return  # The user was never part of the model
+
+        if not remaining:
+            # LBPH can't be trained on an empty set, so drop the model entirely. The version
+            # marker stays and counts up, so running recognizers drop the model too
+            retract_model(self.model_file)
+            if os.path.isfile(self.manifest_file):
+                os.remove(self.manifest_file)
+            return
+
+        self.rebuild(remaining)
 
     def save_model(self):
-        """Save the trained model to file."""
+        """Publish the trained model; running recognizers pick up the new version (see model_reload)."""
         try:
-            self.recognizer.save(self.model_file)
-            messagebox.showinfo("Saved", f"Model trained and saved as {self.model_file}")
+            version = publish_model(self.recognizer, self.model_file)
+            if self.progress:
+                self.progress(TRAINING_STEPS, TRAINING_STEPS, "Model saved")
+            self.notify("showinfo", "Saved", f"Model trained and saved as {self.model_file} (version {version})")
+            return True
         except Exception as e:
-            messagebox.showerror("Error", f"Error saving model: {e}")
+            self.notify("showerror", "Error", f"Error saving model: {e}")
+            return False
 
 if __name__ == "__main__":
     trainer = Trainer()